@@ -3,6 +3,17 @@ import re
 import requests
 import time
 
+# Optional fast JSON backends (pip install orjson or msgspec), decoding straight from the response bytes.
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    try:
+        import msgspec
+        json_loads = msgspec.json.decode
+    except ImportError:
+        json_loads = json.loads
+
 # Three hours ago in milliseconds if your scheduled job run every three hours
 three_hours_ago = int(time.time() * 1000) - 10800000
 
@@ -16,7 +27,7 @@ headers = {
 
 response = requests.get(url, headers=headers)
 if response.status_code == 200:
-    data = response.json()
+    data = json_loads(response.content)
     new_articles_found = False
 
     # Extract relevant articles and URL
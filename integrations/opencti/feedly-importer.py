@@ -9,6 +9,17 @@ import uuid
 import json
 import re
 
+# Optional fast JSON backends (pip install orjson or msgspec), decoding straight from the response bytes.
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    try:
+        import msgspec
+        json_loads = msgspec.json.decode
+    except ImportError:
+        json_loads = json.loads
+
 # Set up the logger
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -60,7 +71,7 @@ while True:
         break
     # Check that the response data is in the expected format
     try:
-        stix_data = response.json()
+        stix_data = json_loads(response.content)
     except Exception as e:
         logging.error(f"Error parsing JSON data from Feedly: {str(e)}")
         break
@@ -2,6 +2,17 @@ import requests
 import json
 from datetime import datetime
 
+# Optional fast JSON backends (pip install orjson or msgspec), decoding straight from the response bytes.
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    try:
+        import msgspec
+        json_loads = msgspec.json.decode
+    except ImportError:
+        json_loads = json.loads
+
 # Placeholders for API keys and IDs
 FEEDLY_API_KEY = "YOUR_FEEDLY_API_KEY"
 FEEDLY_STREAM_ID = "YOUR_FEEDLY_STREAM_ID"
@@ -27,7 +38,7 @@ def get_feedly_articles():
     if response.status_code != 200:
         print(f"Error fetching articles: {response.text}")
         return None
-    return response.json()
+    return json_loads(response.content)
 
 def send_pagerduty_alert(article):
     title = article.get('title', 'No title')
@@ -4,6 +4,19 @@ import sys
 import logging
 from datetime import datetime, timedelta, timezone
 
+# Optional fast JSON backends (pip install orjson or msgspec), decoding straight from the response bytes.
+try:
+    import orjson
+    json_loads, json_dumps = orjson.loads, orjson.dumps
+except ImportError:
+    try:
+        import msgspec
+        json_loads, json_dumps = msgspec.json.decode, msgspec.json.encode
+    except ImportError:
+        json_loads = json.loads
+        def json_dumps(obj):
+            return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
 # Constants for the Feedly API
 FEEDLY_API_URL = "https://feedly.com/v3/enterprise/ioc"
 FEEDLY_STREAM_ID = "YOUR_FEEDLY_STREAM_ID" 
@@ -79,7 +92,7 @@ def fetch_feedly_data(newer_than):
     response = requests.get(FEEDLY_API_URL, headers=FEEDLY_HEADERS, params=params)
     
     if response.status_code == 200:
-        data = response.json()
+        data = json_loads(response.content)
         if not data.get("objects"):
             logger.info(f"No articles found in the specified time period (newer than {newer_than})")
         return data
@@ -96,7 +109,7 @@ def send_to_splunk(data):
     }
 
     for event in data["objects"]:
-        event_data = json.dumps({"event": event})
+        event_data = json_dumps({"event": event})
         
         # Make the POST request to the Splunk HEC for each event
         response = requests.post(SPLUNK_HEC_URL, headers=headers, data=event_data, verify=False)
@@ -3,6 +3,19 @@ import json
 from stix2 import parse
 from datetime import datetime
 
+# Optional fast JSON backends (pip install orjson or msgspec), decoding straight from the response bytes.
+try:
+    import orjson
+    json_loads, json_dumps = orjson.loads, orjson.dumps
+except ImportError:
+    try:
+        import msgspec
+        json_loads, json_dumps = msgspec.json.decode, msgspec.json.encode
+    except ImportError:
+        json_loads = json.loads
+        def json_dumps(obj):
+            return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
 # Feedly API configuration
 FEEDLY_API_BASE_URL = "https://feedly.com/v3/enterprise/ioc"
 FEEDLY_API_KEY = "YOUR_FEEDLY_API_KEY"
@@ -19,7 +32,7 @@ def fetch_feedly_data():
     }
     url = f"{FEEDLY_API_BASE_URL}?streamid={FEEDLY_STREAM_ID}"
     response = requests.get(url, headers=headers)
-    return response.json()
+    return json_loads(response.content)
 
 def parse_stix_data(stix_data):
     bundle = parse(stix_data)
@@ -58,7 +71,7 @@ def send_to_wazuh(data):
         response = requests.post(f"{WAZUH_API_URL}/events", 
                                  headers=headers, 
                                  auth=auth, 
-                                 data=json.dumps(item))
+                                 data=json_dumps(item))
         if response.status_code == 200:
             print(f"Successfully sent indicator: {item['feedly']['name']}")
         else:
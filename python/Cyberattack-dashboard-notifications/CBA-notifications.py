@@ -11,6 +11,7 @@ import yaml
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from notification_outbox import NotificationOutbox, create_table as create_outbox_table, enqueue
 
 
 # Set config function
@@ -69,6 +70,17 @@ class CyberAttackTracker:
         self.setup_logging()  # Set up logging
         self.init_database()  # Initialize database
 
+        # Alerts are queued in the database and delivered by a worker pool with per-channel rate limits
+        outbox_config = config.get("notifications", {})
+        self.outbox = NotificationOutbox(
+            self.db_path,
+            {"slack": self.deliver_slack, "email": self.deliver_email},
+            rate_limits=outbox_config.get("rate_limits", {"slack": 1}),
+            max_workers=outbox_config.get("max_workers", 4),
+            max_attempts=outbox_config.get("max_attempts", 5),
+            logger=self.logger
+        )
+
     # Set up logging messages
     def setup_logging(self):
         logging.basicConfig(
@@ -118,6 +130,8 @@ class CyberAttackTracker:
                 )
             ''')
 
+            create_outbox_table(conn)
+
         if not db_exists:
             self.logger.info(f"Created new database at {self.db_path}")
         else:
@@ -156,11 +170,13 @@ class CyberAttackTracker:
 
         if not attacks:
             self.logger.info("No cyber attacks found.")
+            self.outbox.drain()
             return
 
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         notifications = []
+        run_key = self.current_run_time.isoformat()
 
         for attack in attacks:
             attack_id = attack["id"]
@@ -190,7 +206,6 @@ class CyberAttackTracker:
                           self.current_run_time.isoformat(), attack_id))
 
                     self.logger.info(f"Updated cyber attack: {short_overview}")
-                    self.send_slack_notification(attack, "updated")
                     notifications.append((attack, "updated"))
 
             else:
@@ -204,17 +219,22 @@ class CyberAttackTracker:
                       self.current_run_time.isoformat()))
 
                 self.logger.info(f"New cyber attack found: {short_overview}")
-                self.send_slack_notification(attack, "new")
                 notifications.append((attack, "new"))
 
+        # Queue the alerts in the same transaction as the rows, then deliver after the commit
+        messages = [("slack", f"{attack['id']}:{run_key}", {"text": self.slack_message(attack, change_type)})
+                    for attack, change_type in notifications]
+        if notifications:
+            messages.append(("email", f"digest:{run_key}", self.email_digest(notifications)))
+        enqueue(conn, messages)
+
         conn.commit()
         conn.close()
 
-        if notifications:
-            self.send_email_notification(notifications)
+        self.outbox.drain()
 
-    def send_slack_notification(self, attack_data: Dict[str, Any], change_type: str):
-        """Send a notification to Slack when a new or updated cyber attack is found."""
+    def slack_message(self, attack_data: Dict[str, Any], change_type: str) -> str:
+        """Format the Slack alert for a new or updated cyber attack."""
         short_overview = attack_data.get("shortOverview", "No title available")
         threat_actors = self.extract_threat_actors(attack_data.get("threatActors", []))
         malware_families = self.extract_malware_families(attack_data.get("malwareFamilies", []))
@@ -233,26 +253,20 @@ class CyberAttackTracker:
             f"> *What:* {what_description}\n"
             f"> *Impact:* {so_what}"
         )
+        return message
+
+    def deliver_slack(self, payload: Dict[str, Any]):
+        """Outbox sender for Slack; raises so failed messages are retried."""
+        response = self.slack_client.chat_postMessage(
+            channel=self.slack_channel,
+            text=payload["text"],
+            parse="mrkdwn"
+        )
+        if not response["ok"]:
+            raise SlackApiError(f"Failed to send Slack message: {response['error']}", response)
 
-        try:
-            response = self.slack_client.chat_postMessage(
-                channel=self.slack_channel,
-                text=message,
-                parse="mrkdwn"
-            )
-            if response["ok"]:
-                self.logger.info(f"Sent Slack notification for {short_overview}")
-            else:
-                self.logger.error(f"Failed to send Slack message: {response['error']}")
-
-        except SlackApiError as e:
-            self.logger.error(f"Slack API Error: {str(e)}")
-
-    def send_email_notification(self, notifications: List[tuple]):
-        sender = self.config["gmail"]["sender_email"]
-        password = self.config["gmail"]["sender_password"]
-        recipient = self.config["gmail"]["recipient_email"]
-
+    def email_digest(self, notifications: List[tuple]) -> Dict[str, str]:
+        """Subject and HTML body of the email digest for this run's attacks."""
         # Separate new and updated attacks
         new_attacks = [attack for attack, change_type in notifications if change_type == "new"]
         updated_attacks = [attack for attack, change_type in notifications if change_type == "updated"]
@@ -312,20 +326,24 @@ class CyberAttackTracker:
         <p><strong>So What (Impact):</strong> {so_what}</p>
         </div>
         """
+        return {"subject": subject, "html": body}
+
+    def deliver_email(self, payload: Dict[str, str]):
+        """Outbox sender for the email digest; raises so a failed send is retried."""
+        sender = self.config["gmail"]["sender_email"]
+        password = self.config["gmail"]["sender_password"]
+        recipient = self.config["gmail"]["recipient_email"]
 
         message = MIMEMultipart()
         message["From"] = sender
         message["To"] = recipient
-        message['Subject'] = subject
-        message.attach(MIMEText(body, "html"))
+        message['Subject'] = payload["subject"]
+        message.attach(MIMEText(payload["html"], "html"))
 
-        try:
-            with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-                server.login(sender, password)
-                server.send_message(message)
-                self.logger.info("Sent email digest")
-        except Exception as e:
-            self.logger.error(f"Failed to send email digest: {str(e)}")
+        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
+            server.login(sender, password)
+            server.send_message(message)
+            self.logger.info("Sent email digest")
 
 
 def main():
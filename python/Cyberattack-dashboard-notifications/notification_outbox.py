@@ -0,0 +1,193 @@
+"""SQLite-backed notification outbox for the dashboard notification scripts.
+
+Alerts are enqueued with `enqueue` inside the same transaction that stores the
+records they describe, so a crash or a failing webhook never loses one. A run then
+calls `NotificationOutbox.drain`, which delivers pending rows concurrently through
+one sender callable per channel (Slack, Teams, email, ...). Each channel has its own
+rate limit, failed deliveries are retried with exponential backoff (also across
+runs), and every row is marked delivered exactly once.
+
+A sender receives the decoded payload and must raise on failure.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Rows claimed by a run that died mid-delivery become claimable again after this long
+STALE_CLAIM_MINUTES = 15
+# Longest single retry backoff, in seconds
+MAX_BACKOFF = 60
+
+
+def create_table(conn: sqlite3.Connection):
+    """Create the outbox table if it does not exist yet."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel TEXT NOT NULL,
+            dedupe_key TEXT NOT NULL,
+            payload JSON NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TEXT NOT NULL,
+            claimed_by TEXT,
+            claimed_at TEXT,
+            last_error TEXT,
+            created_at TEXT NOT NULL,
+            delivered_at TEXT,
+            UNIQUE (channel, dedupe_key)
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, next_attempt_at)")
+
+
+def enqueue(conn: sqlite3.Connection, messages: List[Tuple[str, str, Dict[str, Any]]]):
+    """Queue (channel, dedupe_key, payload) messages on an open connection.
+
+    Call this inside the caller's write transaction. A message whose (channel,
+    dedupe_key) is already queued is ignored, so re-running a batch cannot alert twice.
+    """
+    now = datetime.utcnow().isoformat()
+    conn.executemany('''
+        INSERT OR IGNORE INTO outbox (channel, dedupe_key, payload, next_attempt_at, created_at)
+        VALUES (?,?,?,?,?)
+    ''', [(channel, key, json.dumps(payload), now, now) for channel, key, payload in messages])
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart; safe to share between threads."""
+
+    def __init__(self, rate: Optional[float]):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.lock = threading.Lock()
+        self.next_call = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class NotificationOutbox:
+    def __init__(self, db_path: str, senders: Dict[str, Callable[[Dict[str, Any]], None]],
+                 rate_limits: Optional[Dict[str, float]] = None, max_workers: int = 4,
+                 max_attempts: int = 5, logger: Optional[logging.Logger] = None):
+        """Deliver outbox rows of db_path through senders ({channel: callable}).
+
+        rate_limits maps a channel to its maximum messages per second; channels
+        without an entry are not throttled.
+        """
+        self.db_path = db_path
+        self.senders = senders
+        rate_limits = rate_limits or {}
+        self.limiters = {channel: RateLimiter(rate_limits.get(channel)) for channel in senders}
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.logger = logger or logging.getLogger(__name__)
+        self.worker_id = uuid.uuid4().hex
+
+    def claim(self, conn: sqlite3.Connection) -> List[tuple]:
+        """Atomically take ownership of every due row and return (id, channel, payload, attempts)."""
+        now = datetime.utcnow()
+        stale = (now - timedelta(minutes=STALE_CLAIM_MINUTES)).isoformat()
+        channels = list(self.senders)
+        placeholders = ",".join("?" * len(channels))
+        with conn:
+            conn.execute(f'''
+                UPDATE outbox SET status = 'delivering', claimed_by = ?, claimed_at = ?
+                WHERE channel IN ({placeholders}) AND (
+                    (status = 'pending' AND next_attempt_at <= ?)
+                    OR (status = 'delivering' AND claimed_at < ?)
+                )
+            ''', (self.worker_id, now.isoformat(), *channels, now.isoformat(), stale))
+        return conn.execute('''
+            SELECT id, channel, payload, attempts FROM outbox
+            WHERE status = 'delivering' AND claimed_by = ? ORDER BY id
+        ''', (self.worker_id,)).fetchall()
+
+    def deliver(self, channel: str, payload: str):
+        self.limiters[channel].wait()
+        self.senders[channel](json.loads(payload))
+
+    def next_retry_in(self, conn: sqlite3.Connection) -> Optional[float]:
+        """Seconds until the earliest pending retry this drain can still deliver, or None."""
+        channels = list(self.senders)
+        placeholders = ",".join("?" * len(channels))
+        # Only channels with a sender can be claimed; retries queued for others must not keep the drain waiting
+        row = conn.execute(f'''
+            SELECT MIN(next_attempt_at) FROM outbox
+            WHERE status = 'pending' AND attempts > 0 AND channel IN ({placeholders})
+        ''', channels).fetchone()
+        if not row[0]:
+            return None
+        return max(0.0, (datetime.fromisoformat(row[0]) - datetime.utcnow()).total_seconds())
+
+    def drain(self) -> Dict[str, int]:
+        """Deliver everything that is due, retrying failures until they succeed or run out of attempts."""
+        summary = {"delivered": 0, "retried": 0, "failed": 0}
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while True:
+                    rows = self.claim(conn)
+                    if not rows:
+                        wait = self.next_retry_in(conn)
+                        if wait is None or wait > MAX_BACKOFF:
+                            break
+                        time.sleep(wait)
+                        continue
+
+                    futures = {
+                        executor.submit(self.deliver, channel, payload): (row_id, channel, attempts)
+                        for row_id, channel, payload, attempts in rows
+                    }
+                    for future in as_completed(futures):
+                        row_id, channel, attempts = futures[future]
+                        try:
+                            future.result()
+                        except Exception as e:
+                            self.mark_failed(conn, row_id, channel, attempts + 1, e, summary)
+                        else:
+                            self.mark_delivered(conn, row_id)
+                            summary["delivered"] += 1
+        finally:
+            conn.close()
+
+        if any(summary.values()):
+            self.logger.info(
+                f"Outbox: {summary['delivered']} delivered, {summary['retried']} retries, {summary['failed']} failed"
+            )
+        return summary
+
+    def mark_delivered(self, conn: sqlite3.Connection, row_id: int):
+        with conn:
+            conn.execute('''
+                UPDATE outbox SET status = 'delivered', delivered_at = ?, last_error = NULL
+                WHERE id = ? AND claimed_by = ?
+            ''', (datetime.utcnow().isoformat(), row_id, self.worker_id))
+
+    def mark_failed(self, conn: sqlite3.Connection, row_id: int, channel: str, attempts: int,
+                    error: Exception, summary: Dict[str, int]):
+        if attempts >= self.max_attempts:
+            status, next_attempt = "failed", datetime.utcnow()
+            summary["failed"] += 1
+            self.logger.error(f"Giving up on {channel} message {row_id} after {attempts} attempts: {error}")
+        else:
+            backoff = min(2 ** attempts, MAX_BACKOFF)
+            status, next_attempt = "pending", datetime.utcnow() + timedelta(seconds=backoff)
+            summary["retried"] += 1
+            self.logger.warning(f"{channel} message {row_id} failed ({error}), retrying in {backoff}s")
+        with conn:
+            conn.execute('''
+                UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, claimed_by = NULL
+                WHERE id = ? AND claimed_by = ?
+            ''', (status, attempts, next_attempt.isoformat(), str(error), row_id, self.worker_id))
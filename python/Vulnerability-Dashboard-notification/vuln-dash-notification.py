@@ -1,6 +1,8 @@
 import requests
 import sqlite3
 import json
+import hashlib
+import time
 from datetime import datetime, timedelta
 import logging
 from typing import Optional, Dict, Any, List
@@ -12,6 +14,7 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import re
+from notification_outbox import NotificationOutbox, create_table as create_outbox_table, enqueue
 
 
 # Set config function
@@ -50,6 +53,103 @@ def load_config(config_path: str = "config.yaml") -> Dict[str, Any]:
         raise
 
 
+# SQLite limits the number of bound parameters per statement, so id lookups are chunked
+SQLITE_MAX_PARAMS = 900
+
+# Platform limits for digest messages: Slack allows 50 blocks per message and 3000 characters
+# per section, Teams rejects webhook payloads above ~28 KB so cards are kept below that. A single
+# Teams entry is capped well below the card limit, leaving room for the card header.
+SLACK_MAX_BLOCKS = 50
+SLACK_MAX_SECTION_CHARS = 3000
+TEAMS_MAX_CARD_BYTES = 25000
+TEAMS_MAX_ENTRY_BYTES = 20000
+
+
+def canonical_hash(record: Dict[str, Any]) -> str:
+    """Digest of a record's canonical JSON (sorted keys, no whitespace), stable across key order."""
+    canonical = json.dumps(record, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def resolve_path(record: Dict[str, Any], path: str) -> Any:
+    """Return the value at a dotted path such as "cvssV3.baseScore", or None if any part is missing."""
+    value = record
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def json_diff(old: Any, new: Any, path: str = ""):
+    """Yield (path, old_value, new_value) for every leaf that differs; lists are compared as a whole."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in sorted(old.keys() | new.keys()):
+            yield from json_diff(old.get(key), new.get(key), f"{path}.{key}" if path else key)
+    elif old != new:
+        yield path, old, new
+
+
+def diff_records(old: Dict[str, Any], new: Dict[str, Any], tracked_fields: Optional[List[str]]) -> List[tuple]:
+    """Field-level changes between two records, restricted to tracked_fields (every field when None)."""
+    if tracked_fields is None:
+        return list(json_diff(old, new))
+    changes = []
+    for field in tracked_fields:
+        changes.extend(json_diff(resolve_path(old, field), resolve_path(new, field), field))
+    return changes
+
+
+def format_change(path: str, old: Any, new: Any, max_length: int = 80) -> str:
+    """One-line summary of a field change for alerts, e.g. "cvssV3.baseScore: 7.5 -> 9.8"."""
+    def short(value):
+        text = json.dumps(value, ensure_ascii=False)
+        return text if len(text) <= max_length else text[:max_length - 3] + "..."
+    return f"{path}: {short(old)} -> {short(new)}"
+
+
+def cvss_sort_key(notification: tuple) -> float:
+    """Sort key putting the highest CVSS first; CVEs without a score go last."""
+    score = notification[2].get("cvssV3", {}).get("baseScore")
+    return -score if isinstance(score, (int, float)) else 1.0
+
+
+def affected_summary(vuln: Dict[str, Any]) -> str:
+    """"Vendor: product, product" for the first affected vendor, or N/A."""
+    affected = vuln.get("affectedProductsEstimate") or []
+    if not affected:
+        return "N/A"
+    products = ", ".join(p.get("name", "") for p in affected[0].get("products", []))
+    return f"{affected[0].get('vendor', 'N/A')}: {products}" if products else affected[0].get("vendor", "N/A")
+
+
+def truncate_to_json_size(text: str, max_bytes: int) -> str:
+    """Shorten text with a trailing "..." until its JSON encoding is at most max_bytes."""
+    size = len(json.dumps(text))
+    if size <= max_bytes:
+        return text
+    while size > max_bytes and text:
+        # Escaped characters take several bytes, so cut proportionally and re-measure
+        text = text[:max(0, len(text) * max_bytes // size - 4)]
+        size = len(json.dumps(text + "..."))
+    return text + "..."
+
+
+def chunk_by_size(items: List[Any], max_items: int, max_bytes: int) -> List[List[Any]]:
+    """Split items into consecutive chunks of at most max_items whose JSON size stays under max_bytes."""
+    chunks, chunk, size = [], [], 0
+    for item in items:
+        item_size = len(json.dumps(item))
+        if chunk and (len(chunk) >= max_items or size + item_size > max_bytes):
+            chunks.append(chunk)
+            chunk, size = [], 0
+        chunk.append(item)
+        size += item_size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
 # Validate and create Database
 class VulnerabilityTracker:
     def __init__(self, config: Dict[str, Any]):
@@ -66,6 +166,12 @@ class VulnerabilityTracker:
         # Teams webhook URL (optional)
         self.teams_webhook_url = config.get("teams", {}).get("webhook_url")
 
+        # Dotted paths whose changes are worth an alert; changes elsewhere are stored silently
+        self.tracked_fields = config.get("tracked_fields")
+
+        # Digest mode groups a run's alerts into a few Slack/Teams messages instead of one per CVE
+        self.digest = config.get("notifications", {}).get("digest", False)
+
         self.base_url = "https://api.feedly.com/v3/trends/vulnerability-dashboard"  # Correct Feedly API URL
         self.current_run_time = datetime.utcnow()  # Store script execution time
         self.config = config  # Store full configuration
@@ -73,6 +179,20 @@ class VulnerabilityTracker:
         self.setup_logging()  # Set up logging
         self.init_database()  # Initialize database
 
+        # Alerts are queued in the database and delivered by a worker pool with per-channel rate limits
+        outbox_config = config.get("notifications", {})
+        senders = {"slack": self.deliver_slack, "email": self.deliver_email}
+        if self.teams_webhook_url:
+            senders["teams"] = self.deliver_teams
+        self.outbox = NotificationOutbox(
+            self.db_path,
+            senders,
+            rate_limits=outbox_config.get("rate_limits", {"slack": 1, "teams": 0.5}),
+            max_workers=outbox_config.get("max_workers", 4),
+            max_attempts=outbox_config.get("max_attempts", 5),
+            logger=self.logger
+        )
+
     # Set up logging messages
     def setup_logging(self):
         logging.basicConfig(
@@ -87,6 +207,8 @@ class VulnerabilityTracker:
         os.makedirs(os.path.dirname(os.path.abspath(self.db_path)),exist_ok=True)
         with sqlite3.connect(self.db_path) as conn:
             conn.execute("PRAGMA foreign_keys = ON")
+            # WAL lets dashboard readers keep reading while a run writes; the setting persists in the file
+            conn.execute("PRAGMA journal_mode = WAL")
 
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS vulnerabilities (
@@ -118,6 +240,8 @@ class VulnerabilityTracker:
                 )
             ''')
 
+            create_outbox_table(conn)
+
         if not db_exists:
             self.logger.info(f"created new database at {self.db_path}")
         else:
@@ -137,67 +261,211 @@ class VulnerabilityTracker:
             self.logger.error(f"API request failed {str(e)}")
             return {}
 
-    def process_vulnerabilities(self):
-        # Fetch vulnerabilities and detect change
-        vulnerabilities = self.fetch_vulnerabilities().get('vulnerabilities',[])
+    def load_stored(self, cursor: sqlite3.Cursor, column: str, vuln_ids: List[str]) -> Dict[str, Any]:
+        """Return {id: column} for the ids of this batch that are already stored, in as few queries as possible."""
+        stored = {}
+        for start in range(0, len(vuln_ids), SQLITE_MAX_PARAMS):
+            chunk = vuln_ids[start:start + SQLITE_MAX_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(f"SELECT id, {column} FROM vulnerabilities WHERE id IN ({placeholders})", chunk)
+            stored.update(cursor.fetchall())
+        return stored
+
+    def detect_changes(self, vulnerabilities: List[Dict[str, Any]]) -> tuple:
+        """Compare the fetched batch against the database without writing to it.
+
+        Returns (upserts, backfills, change_rows, notifications): rows for
+        write_vulnerabilities, (hash, id) pairs for legacy rows that only need their
+        hash stored, change_log rows, and the (cve_id, change_type, vuln,
+        insight_url, changes) tuples to notify about.
+        """
+        upserts, backfills, change_rows, notifications = [], [], [], []
+        run_time = self.current_run_time.isoformat()
 
-        if not vulnerabilities:
-            self.logger.info("No new vulnerabilities found.")
-            return
-
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        notifications = []
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            stored_hashes = self.load_stored(cursor, "hash", [vuln["id"] for vuln in vulnerabilities])
+            changed = [vuln for vuln in vulnerabilities
+                       if vuln["id"] in stored_hashes and stored_hashes[vuln["id"]] != canonical_hash(vuln)]
+            # Only rows whose digest moved are decoded
+            stored_data = self.load_stored(cursor, "data", [vuln["id"] for vuln in changed])
+        conn.close()
 
         for vuln in vulnerabilities:
             vuln_id = vuln["id"]
+            vuln_hash = canonical_hash(vuln)
             cve_id = vuln.get("cveid", "unknown CVE")
-            cvss_score = vuln.get("cvssV3", {}).get("baseScore","N/A")
             vuln_ic = "https://feedly.com/i/cve/" + cve_id
 
-            affected_products = vuln.get("affectedProductsEstimate",[])
-            if affected_products:
-                vendor = affected_products[0].get("vendor", "N/A")
-                product = [p["name"] for p in affected_products[0].get("products",[])]
-            else:
-                vendor = 'N/A'
-                product = []
-
-            vuln_data = json.dumps(vuln)
-            cursor.execute("SELECT data FROM vulnerabilities WHERE id = ?", (vuln_id,))
-            result = cursor.fetchone()
-
-            if result:
-                old_data = json.loads(result[0])
-                if old_data != vuln:
-                    cursor.execute('''
-                        UPDATE vulnerabilities
-                        SET data = ?, last_updated = ?, cvss = ?
-                        WHERE id = ?
-                    ''', (vuln_data, self.current_run_time.isoformat(), cvss_score, vuln_id))
-
-                    self.logger.info(f"Updated vulnerability: {cve_id}")
-                    self.send_slack_notification(cve_id, "updated", vuln, vuln_ic)
-                    self.send_teams_notification(cve_id, "updated", vuln, vuln_ic)
-                    notifications.append((cve_id, "updated", vuln, vuln_ic))
-
+            if vuln_id not in stored_hashes:
+                change_type, changes = "new", []
+                change_rows.append((vuln_id, run_time, None, None, None, "new"))
+            elif vuln_id in stored_data:
+                old_vuln = json.loads(stored_data[vuln_id])
+                # Rows written before hashes were stored have none yet; identical ones only need the hash
+                if stored_hashes[vuln_id] is None and old_vuln == vuln:
+                    backfills.append((vuln_hash, vuln_id))
+                    continue
+                change_type, changes = "updated", diff_records(old_vuln, vuln, self.tracked_fields)
+                change_rows.extend(
+                    (vuln_id, run_time, path, json.dumps(old), json.dumps(new), "updated")
+                    for path, old, new in changes
+                )
             else:
-                cursor.execute('''
-                    INSERT INTO vulnerabilities (id, cveid, data, last_updated, cvss) VALUES (?,?,?,?,?)
-                ''', (vuln_id, cve_id, vuln_data, self.current_run_time.isoformat(), cvss_score))
+                continue
 
-                self.logger.info(f"New vulnerability found: {cve_id}")
-                self.send_slack_notification(cve_id, "new", vuln, vuln_ic)
-                self.send_teams_notification(cve_id, "new", vuln, vuln_ic)
-                notifications.append((cve_id, "new",vuln,vuln_ic))
+            cvss_score = vuln.get("cvssV3", {}).get("baseScore","N/A")
+            upserts.append((vuln_id, cve_id, cvss_score, json.dumps(vuln), vuln_hash, run_time))
+            if change_type == "updated" and not changes:
+                self.logger.info(f"Ignoring untracked changes to {cve_id}")
+                continue
+            notifications.append((cve_id, change_type, vuln, vuln_ic, changes))
+
+        return upserts, backfills, change_rows, notifications
+
+    def write_vulnerabilities(self, upserts: List[tuple], backfills: List[tuple], change_rows: List[tuple],
+                              messages: List[tuple]):
+        """Apply all inserts/updates, change_log rows and queued alerts of a run in one short transaction."""
+        if not upserts and not backfills:
+            return
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                conn.executemany('''
+                    INSERT INTO vulnerabilities (id, cveid, cvss, data, hash, last_updated) VALUES (?,?,?,?,?,?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        cveid = excluded.cveid,
+                        cvss = excluded.cvss,
+                        data = excluded.data,
+                        hash = excluded.hash,
+                        last_updated = excluded.last_updated
+                ''', upserts)
+                conn.executemany("UPDATE vulnerabilities SET hash = ? WHERE id = ?", backfills)
+                conn.executemany('''
+                    INSERT INTO change_log (id, changed_at, field_name, old_value, new_value, change_type)
+                    VALUES (?,?,?,?,?,?)
+                ''', change_rows)
+                enqueue(conn, messages)
+        finally:
+            conn.close()
+
+    def build_messages(self, notifications: List[tuple]) -> List[tuple]:
+        """Outbox messages (channel, dedupe_key, payload) for the alerts of this run."""
+        if not notifications:
+            return []
+        messages = []
+        run_key = self.current_run_time.isoformat()
+        if self.digest:
+            slack_digest = self.slack_digest(notifications)
+            messages.extend(("slack", f"digest:{run_key}:{part}", payload) for part, payload in enumerate(slack_digest))
+            if self.teams_webhook_url:
+                teams_digest = self.teams_digest(notifications)
+                messages.extend(("teams", f"digest:{run_key}:{part}", payload) for part, payload in enumerate(teams_digest))
+            self.logger.info(f"Grouped {len(notifications)} alerts into {len(slack_digest)} Slack digest message(s)")
+        else:
+            for cve_id, change_type, vuln, vuln_ic, changes in notifications:
+                # The content hash makes the key unique per version of a CVE, so each change alerts once
+                key = f"{cve_id}:{canonical_hash(vuln)}"
+                messages.append(("slack", key, {"text": self.slack_message(cve_id, change_type, vuln, vuln_ic, changes)}))
+                if self.teams_webhook_url:
+                    messages.append(("teams", key, {"text": self.teams_message(cve_id, change_type, vuln, vuln_ic, changes)}))
+        messages.append(("email", f"digest:{run_key}", self.email_digest(notifications)))
+        return messages
+
+    def slack_digest(self, notifications: List[tuple]) -> List[Dict[str, Any]]:
+        """Block Kit payloads listing every alert of the run, highest CVSS first."""
+        sections = []
+        for cve_id, change_type, vuln, vuln_ic, changes in sorted(notifications, key=cvss_sort_key):
+            cvss_score = vuln.get("cvssV3", {}).get("baseScore", "N/A")
+            text = (
+                f"*<{vuln_ic}|{cve_id}>*  ·  CVSS {cvss_score}  ·  {change_type.upper()}\n"
+                f"{affected_summary(vuln)}"
+            )
+            if changes:
+                text += "\n_Changed:_ " + "; ".join(format_change(*change) for change in changes)
+            if len(text) > SLACK_MAX_SECTION_CHARS:
+                text = text[:SLACK_MAX_SECTION_CHARS - 3] + "..."
+            sections.append({"type": "section", "text": {"type": "mrkdwn", "text": text}})
+
+        new_count = sum(1 for notification in notifications if notification[1] == "new")
+        title = f"CVE digest: {new_count} new, {len(notifications) - new_count} updated"
+        # One block per message is reserved for the header
+        chunks = chunk_by_size(sections, SLACK_MAX_BLOCKS - 1, float("inf"))
+        payloads = []
+        for part, chunk in enumerate(chunks, 1):
+            header = title if len(chunks) == 1 else f"{title} ({part}/{len(chunks)})"
+            payloads.append({
+                "text": header,
+                "blocks": [{"type": "header", "text": {"type": "plain_text", "text": header}}] + chunk
+            })
+        return payloads
+
+    def teams_digest(self, notifications: List[tuple]) -> List[Dict[str, Any]]:
+        """Adaptive Card payloads listing every alert of the run, highest CVSS first."""
+        entries = []
+        for cve_id, change_type, vuln, vuln_ic, changes in sorted(notifications, key=cvss_sort_key):
+            cvss_score = vuln.get("cvssV3", {}).get("baseScore", "N/A")
+            details = affected_summary(vuln)
+            if changes:
+                details += "\n\nChanged: " + "; ".join(format_change(*change) for change in changes)
+            details_block = {"type": "TextBlock", "wrap": True, "isSubtle": True, "spacing": "None", "text": ""}
+            entry = {
+                "type": "Container",
+                "separator": True,
+                "items": [
+                    {"type": "TextBlock", "wrap": True, "weight": "Bolder",
+                     "text": f"[{cve_id}]({vuln_ic}) · CVSS {cvss_score} · {change_type.upper()}"},
+                    details_block
+                ]
+            }
+            # chunk_by_size cannot split one entry, so long change lists are cut to keep every entry sendable
+            details_block["text"] = truncate_to_json_size(details, TEAMS_MAX_ENTRY_BYTES - len(json.dumps(entry)))
+            entries.append(entry)
+
+        new_count = sum(1 for notification in notifications if notification[1] == "new")
+        title = f"CVE digest: {new_count} new, {len(notifications) - new_count} updated"
+
+        def card(header: str, chunk: List[Dict[str, Any]]) -> Dict[str, Any]:
+            return {"card": {
+                "type": "AdaptiveCard",
+                "$schema": "http://adaptivecards.io/schemas/adaptive-card.json",
+                "version": "1.4",
+                "body": [{"type": "TextBlock", "text": header, "weight": "Bolder", "size": "Medium", "wrap": True}] + chunk
+            }}
+
+        # Leave room for the card itself and a "(part/total)" header suffix
+        overhead = len(json.dumps(card(f"{title} (9999/9999)", [])))
+        chunks = chunk_by_size(entries, len(entries), TEAMS_MAX_CARD_BYTES - overhead)
+        return [
+            card(title if len(chunks) == 1 else f"{title} ({part}/{len(chunks)})", chunk)
+            for part, chunk in enumerate(chunks, 1)
+        ]
 
-        conn.commit()
-        conn.close()
-        if notifications:
-            self.send_email_notification(notifications)
+    def process_vulnerabilities(self):
+        # Fetch vulnerabilities and detect change
+        vulnerabilities = self.fetch_vulnerabilities().get('vulnerabilities',[])
 
-    def send_slack_notification(self, cve_id: str, change_type:str, vuln_data: Dict[str,Any], insight_url: str):
-        # Send a notification to slack when a new or updated vulnerability is found
+        if not vulnerabilities:
+            self.logger.info("No new vulnerabilities found.")
+        else:
+            upserts, backfills, change_rows, notifications = self.detect_changes(vulnerabilities)
+            for cve_id, change_type, vuln, vuln_ic, changes in notifications:
+                if change_type == "new":
+                    self.logger.info(f"New vulnerability found: {cve_id}")
+                else:
+                    self.logger.info(f"Updated vulnerability: {cve_id} ({', '.join(path for path, _, _ in changes)})")
+
+            started = time.perf_counter()
+            self.write_vulnerabilities(upserts, backfills, change_rows, self.build_messages(notifications))
+            self.logger.info(f"Stored {len(upserts)} new/updated vulnerabilities in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        # Deliver only after the write transaction has committed, so slow webhooks never hold the database.
+        # This also retries alerts left undelivered by earlier runs.
+        self.outbox.drain()
+
+    def slack_message(self, cve_id: str, change_type:str, vuln_data: Dict[str,Any], insight_url: str,
+                      changes: Optional[List[tuple]] = None) -> str:
+        # Format the Slack alert for a new or updated vulnerability
         cvss_score = vuln_data.get("cvssV3", {}).get("baseScore", "N/A")
         affected_products = vuln_data.get("affectedProductsEstimate")
         message = (
@@ -207,26 +475,24 @@ class VulnerabilityTracker:
             f"> *Check full Insight Card* <{insight_url} | in Feedly>\n"
             f"> *Affected product:* {affected_products}"
         )
+        if changes:
+            message += "\n> *Changed:* " + "; ".join(format_change(*change) for change in changes)
+        return message
+
+    def deliver_slack(self, payload: Dict[str, Any]):
+        """Outbox sender for Slack; raises so failed messages are retried."""
+        response = self.slack_client.chat_postMessage(
+            channel=self.slack_channel,
+            text=payload["text"],
+            blocks=payload.get("blocks"),
+            parse="mrkdwn"
+        )
+        if not response["ok"]:
+            raise SlackApiError(f"Failed to send Slack message: {response['error']}", response)
 
-        try:
-            response = self.slack_client.chat_postMessage(
-                channel=self.slack_channel,
-                text=message,
-                parse="mrkdwn"
-            )
-            if response["ok"]:
-                self.logger.info(f"Sent Slack notification for {cve_id}")
-            else:
-                self.logger.error(f"Failed to send Slack message: {response['error']}")
-
-        except SlackApiError as e:
-            self.logger.error(f"Slack API Error: {str(e)}")
-
-    def send_teams_notification(self, cve_id: str, change_type: str, vuln_data: Dict[str, Any], insight_url: str):
-        """Send a notification to Microsoft Teams when a new or updated vulnerability is found."""
-        if not self.teams_webhook_url:
-            return
-
+    def teams_message(self, cve_id: str, change_type: str, vuln_data: Dict[str, Any], insight_url: str,
+                      changes: Optional[List[tuple]] = None) -> str:
+        """Format the Microsoft Teams alert for a new or updated vulnerability."""
         cvss_score = vuln_data.get("cvssV3", {}).get("baseScore", "N/A")
         affected_products = vuln_data.get("affectedProductsEstimate")
 
@@ -238,64 +504,75 @@ class VulnerabilityTracker:
             f"• **Check full Insight Card:** [in Feedly]({insight_url})\n"
             f"• **Affected product:** {affected_products}"
         )
-
-        self.send_teams_message(message)
+        if changes:
+            message += "\n• **Changed:** " + "; ".join(format_change(*change) for change in changes)
+        return message
+
+    def deliver_teams(self, payload: Dict[str, Any]):
+        """Outbox sender for Teams; raises so failed messages are retried."""
+        if "card" not in payload:
+            self.send_teams_message(payload["text"])
+            return
+        response = requests.post(
+            self.teams_webhook_url,
+            json={
+                "type": "message",
+                "attachments": [{"contentType": "application/vnd.microsoft.card.adaptive", "content": payload["card"]}]
+            },
+            headers={"Content-Type": "application/json"}
+        )
+        response.raise_for_status()
+        self.logger.info("Successfully sent Teams digest card")
 
     def send_teams_message(self, message: str) -> None:
-        """Send a message to Microsoft Teams via webhook."""
+        """Send a message to Microsoft Teams via webhook. Raises on HTTP errors."""
         if not self.teams_webhook_url:
             return
-        try:
-            # Convert Slack's *<url|text>* format to Teams' **[text](url)** format
-            teams_message = message
-            # Find all Slack-style links: *<url|text>*
-            slack_links = re.findall(r'\*<([^|]+)\|([^>]+)>\*', teams_message)
-            # Replace each link with Teams markdown format
-            for url, text in slack_links:
-                slack_format = f'*<{url}|{text}>*'
-                teams_format = f'**[{text}]({url})**'
-                teams_message = teams_message.replace(slack_format, teams_format)
-
-            # Format the message with appropriate newlines
-            # Add newline after CVE ID and field name
-            teams_message = re.sub(r'(\*\*\[.*?\]\(.*?\)\*\*) - ([^:]+):', r'\1\n\2:', teams_message)
-            # Ensure bullet points start on new lines and are properly spaced
-            teams_message = re.sub(r'([^:\n])(•)', r'\1\n•', teams_message)
-            teams_message = re.sub(r'(\n•[^\n]+)(\n•)', r'\1\n\2', teams_message)
-
-            # Split message into parts if it's too long
-            header = teams_message.split("\n\n")[0]  # Keep the header
-            updates = teams_message.split("\n\n")[1:]  # Get all updates
-
-            # Send updates in batches
-            batch_size = 40  # Increased batch size
-            for i in range(0, len(updates), batch_size):
-                batch = updates[i:i + batch_size]
-                batch_message = f"{header}\n\n" + "\n\n".join(batch)
-
-                payload = {
-                    "text": batch_message
-                }
-
-                response = requests.post(
-                    self.teams_webhook_url,
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                response.raise_for_status()
-                self.logger.info(f"Successfully sent Teams message batch {i//batch_size + 1}")
-
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"Error sending message to Teams: {str(e)}")
+        # Convert Slack's *<url|text>* format to Teams' **[text](url)** format
+        teams_message = message
+        # Find all Slack-style links: *<url|text>*
+        slack_links = re.findall(r'\*<([^|]+)\|([^>]+)>\*', teams_message)
+        # Replace each link with Teams markdown format
+        for url, text in slack_links:
+            slack_format = f'*<{url}|{text}>*'
+            teams_format = f'**[{text}]({url})**'
+            teams_message = teams_message.replace(slack_format, teams_format)
+
+        # Format the message with appropriate newlines
+        # Add newline after CVE ID and field name
+        teams_message = re.sub(r'(\*\*\[.*?\]\(.*?\)\*\*) - ([^:]+):', r'\1\n\2:', teams_message)
+        # Ensure bullet points start on new lines and are properly spaced
+        teams_message = re.sub(r'([^:\n])(•)', r'\1\n•', teams_message)
+        teams_message = re.sub(r'(\n•[^\n]+)(\n•)', r'\1\n\2', teams_message)
+
+        # Split message into parts if it's too long
+        header = teams_message.split("\n\n")[0]  # Keep the header
+        updates = teams_message.split("\n\n")[1:]  # Get all updates
+
+        # Send updates in batches
+        batch_size = 40  # Increased batch size
+        for i in range(0, len(updates), batch_size):
+            batch = updates[i:i + batch_size]
+            batch_message = f"{header}\n\n" + "\n\n".join(batch)
+
+            payload = {
+                "text": batch_message
+            }
+
+            response = requests.post(
+                self.teams_webhook_url,
+                json=payload,
+                headers={"Content-Type": "application/json"}
+            )
+            response.raise_for_status()
+            self.logger.info(f"Successfully sent Teams message batch {i//batch_size + 1}")
 
-    def send_email_notification(self, notifications: List[tuple]):
-        sender = self.config["gmail"]["sender_email"]
-        password = self.config["gmail"]["sender_password"]
-        recipient = self.config["gmail"]["recipient_email"]
+    def email_digest(self, notifications: List[tuple]) -> Dict[str, str]:
+        """Subject and HTML body of the email digest for this run's alerts."""
         subject = f"CVE Digest: {len(notifications)} new/updated vulnerabilities"
 
         body = ""
-        for cve_id, change_type, vuln_data, insight_url in notifications:
+        for cve_id, change_type, vuln_data, insight_url, changes in notifications:
             cvss_score = vuln_data.get("cvssV3", {}).get("baseScore", "N/A")
             description = vuln_data.get("description", "No description available.")
             affected = vuln_data.get("affectedProductEstimate", [])
@@ -305,6 +582,7 @@ class VulnerabilityTracker:
             else:
                 vendor = "N/A"
                 products = []
+            changed = "".join(f"<p><strong>Changed:</strong> {format_change(*change)}</p>" for change in changes)
 
             body += f"""
     <h2>{change_type.upper()} CVE Alert</h2>
@@ -314,22 +592,27 @@ class VulnerabilityTracker:
     <p><strong>Products:</strong> {','.join(products)}</p>
     <p><strong>Description:</strong> {description}</p>
     <p><strong>Insight Cards:</strong><a href='{insight_url}'>{insight_url}</a></p>
+    {changed}
     -------------------------------------------------------------
     """
+        return {"subject": subject, "html": body}
+
+    def deliver_email(self, payload: Dict[str, str]):
+        """Outbox sender for the email digest; raises so a failed send is retried."""
+        sender = self.config["gmail"]["sender_email"]
+        password = self.config["gmail"]["sender_password"]
+        recipient = self.config["gmail"]["recipient_email"]
 
         message = MIMEMultipart()
         message["From"] = sender
         message["To"] = recipient
-        message['Subject'] = subject
-        message.attach(MIMEText(body,"html"))
+        message['Subject'] = payload["subject"]
+        message.attach(MIMEText(payload["html"],"html"))
 
-        try:
-            with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-                server.login(sender, password)
-                server.send_message(message)
-                self.logger.info("Sent email digest")
-        except Exception as e:
-            self.logger.error(f"Failed to send email digest: {str(e)}")
+        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
+            server.login(sender, password)
+            server.send_message(message)
+            self.logger.info("Sent email digest")
 
 
 def main():
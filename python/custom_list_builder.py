@@ -1,59 +1,213 @@
+import os
+import csv
+import json
 import requests
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 
 API_KEY = 'YOUR API KEY' # Add your API key here
 CSV_FILE_PATH = 'YOUR CSV FILE PATH' # Add the absolute or relative CSV file path here (the CSV should only contain a single column with the entities)
 BASE_URL = 'https://api.feedly.com/v3'
+ENTITY_CACHE_FILE = 'entity_cache.json' # Resolved names are kept here so re-runs only look up new names
+MAX_WORKERS = 8 # Number of entity lookups running at the same time
+REQUEST_TIMEOUT = 30 # Seconds
+LIST_LABEL = 'API Custom List' # Change the name of your Custom List here
+CHUNK_SIZE = 1000 # Maximum entities per list; larger inputs are split into '<label> (part 2)', ...
+DIFF_MODE = True # Only update the lists whose entities changed since the last upload
+LIST_STATE_FILE = 'custom_list_state.json' # Remembers the uploaded lists for DIFF_MODE
+
+session = requests.Session()
+session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS))
+
+def read_queries(path):
+    """Yield the first column of a CSV file (after its header row) without loading the file.
+
+    Excel workbooks (.xls/.xlsx) are read with pandas, which is only imported for them.
+    """
+    if path.lower().endswith(('.xls', '.xlsx')):
+        import pandas as pd
+        yield from pd.read_excel(path).iloc[:, 0].dropna()
+        return
+    with open(path, 'r', newline='', encoding='utf-8-sig') as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader, None)  # Skip the header row
+        for row in reader:
+            if row:
+                yield row[0]
+
+def normalize_query(query):
+    # Collapse whitespace so ' APT  28 ' and 'APT 28' are looked up once
+    return ' '.join(str(query).split())
+
+def load_entity_cache():
+    if not os.path.exists(ENTITY_CACHE_FILE):
+        return {}
+    with open(ENTITY_CACHE_FILE, 'r', encoding='utf-8') as cache_file:
+        return json.load(cache_file)
+
+def save_entity_cache(cache):
+    temp_path = f'{ENTITY_CACHE_FILE}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as cache_file:
+        json.dump(cache, cache_file, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(temp_path, ENTITY_CACHE_FILE)
 
 def get_entity_id(query, api_key):
-    url = f"{BASE_URL}/search/entities?query={query.replace(' ', '%20')}"
+    url = f"{BASE_URL}/search/entities"
     headers = {'Authorization': f'Bearer {api_key}'}
-    response = requests.get(url, headers=headers)
+    try:
+        response = session.get(url, headers=headers, params={'query': query}, timeout=REQUEST_TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        print(f'Failed to fetch data for {query}: {e}')
+        return None
     if response.status_code == 200:
         return response.json()
     else:
         print(f'Failed to fetch data for {query}')
         return None
 
+def resolve_query(query, api_key):
+    """Return (query, entity id or None, resolved) where resolved is False if the lookup failed."""
+    result = get_entity_id(query, api_key)
+    if result is None:
+        return query, None, False
+    if result.get('entities'):
+        return query, result['entities'][0]['id'], True
+    return query, None, True
+
 def process_queries(query_list, api_key):
-    entities = []
+    # Deduplicate case-insensitively, keeping the first spelling of each name
+    unique_queries = {}
     for query in query_list:
-        result = get_entity_id(query, api_key)
-        if result and result.get('entities'):
-            entity_id = result['entities'][0]['id']
-            entities.append({'id': entity_id})
-        else:
+        query = normalize_query(query)
+        if query:
+            unique_queries.setdefault(query.lower(), query)
+
+    cache = load_entity_cache()
+    new_queries = [query for key, query in unique_queries.items() if key not in cache]
+    print(f'{len(unique_queries)} unique names, {len(unique_queries) - len(new_queries)} already in the cache, resolving {len(new_queries)}')
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for query, entity_id, resolved in executor.map(lambda query: resolve_query(query, api_key), new_queries):
+            # Failed lookups are not cached so they are retried on the next run
+            if resolved:
+                cache[query.lower()] = entity_id
+    save_entity_cache(cache)
+
+    entities = []
+    seen_ids = set()
+    for key, query in unique_queries.items():
+        entity_id = cache.get(key)
+        if entity_id is None:
             entities.append({'text': query})
+        elif entity_id not in seen_ids:
+            seen_ids.add(entity_id)
+            entities.append({'id': entity_id})
     return entities
 
-def build_payload(query_list, api_key, label='API Custom List'): # Change the name of your Custom List here
-    processed_entities = process_queries(query_list, api_key)
-    payload = {
-        'label': label,
-        'entities': processed_entities,
-        'type': 'customTopic'
-    }
-    return payload
-
-def post_payload(api_key, payload):
-    url = f'{BASE_URL}/enterprise/entityLists'
+def post_payload(api_key, payload, list_id=None):
+    # Without a list id a new list is created, otherwise the existing list is updated
+    url = f'{BASE_URL}/enterprise/entityLists' if list_id is None else f'{BASE_URL}/enterprise/entityLists/{list_id}'
     headers = {
         'Content-Type': 'application/json',
         'Authorization': f'Bearer {api_key}'
     }
-    response = requests.post(url, headers=headers, json=payload)
+    response = session.post(url, headers=headers, json=payload, timeout=REQUEST_TIMEOUT)
     if response.status_code == 200 or response.status_code == 204:
-        print('Payload successfully posted.')
+        print(f"Payload successfully posted ({payload['label']}, {len(payload['entities'])} entities).")
     else:
         print(f'Failed to post payload: {response.status_code} - {response.text}')
     return response
 
+def entity_key(entity):
+    return f"id:{entity['id']}" if 'id' in entity else f"text:{entity['text']}"
+
+def load_list_state(label):
+    if not os.path.exists(LIST_STATE_FILE):
+        return []
+    with open(LIST_STATE_FILE, 'r', encoding='utf-8') as state_file:
+        return json.load(state_file).get(label, [])
+
+def save_list_state(label, lists):
+    state = {}
+    if os.path.exists(LIST_STATE_FILE):
+        with open(LIST_STATE_FILE, 'r', encoding='utf-8') as state_file:
+            state = json.load(state_file)
+    state[label] = [{'id': lst['id'], 'label': lst['label'], 'entities': lst['entities']} for lst in lists]
+    temp_path = f'{LIST_STATE_FILE}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as state_file:
+        json.dump(state, state_file, ensure_ascii=False, indent=2)
+    os.replace(temp_path, LIST_STATE_FILE)
+
+def plan_lists(entities, previous_lists, label, chunk_size=CHUNK_SIZE):
+    """Split entities into lists of at most chunk_size, reusing the previously uploaded lists.
+
+    Entities stay in the list they were uploaded to, removed entities are dropped from
+    it and new entities fill free slots before new lists are added, so only lists whose
+    content actually changed are marked for upload.
+    """
+    wanted = {entity_key(entity): entity for entity in entities}
+    lists = []
+    placed = set()
+    for previous in previous_lists:
+        kept = [entity for entity in previous['entities'] if entity_key(entity) in wanted]
+        placed.update(entity_key(entity) for entity in kept)
+        lists.append({'id': previous['id'], 'label': previous['label'], 'entities': kept,
+                      'changed': previous['id'] is None or len(kept) != len(previous['entities'])})
+
+    new_entities = [entity for key, entity in wanted.items() if key not in placed]
+    for lst in lists:
+        room = chunk_size - len(lst['entities'])
+        if new_entities and room > 0:
+            lst['entities'].extend(new_entities[:room])
+            new_entities = new_entities[room:]
+            lst['changed'] = True
+    # A list that failed to upload leaves a gap in the part numbers; fill it instead of reusing a label
+    used_labels = {lst['label'] for lst in lists}
+    part = 1
+    while new_entities:
+        while (label if part == 1 else f'{label} (part {part})') in used_labels:
+            part += 1
+        part_label = label if part == 1 else f'{label} (part {part})'
+        used_labels.add(part_label)
+        lists.append({'id': None, 'label': part_label, 'entities': new_entities[:chunk_size], 'changed': True})
+        new_entities = new_entities[chunk_size:]
+    return lists
+
+def upload_list(api_key, lst):
+    try:
+        response = post_payload(api_key, {'label': lst['label'], 'entities': lst['entities'], 'type': 'customTopic'}, lst['id'])
+        if response.status_code == 200 and lst['id'] is None and response.content:
+            lst['id'] = response.json().get('id')
+    except (requests.exceptions.RequestException, ValueError) as e:
+        # Treated like a failed status: the list stays marked as changed and is retried next run
+        print(f"Failed to upload list {lst['label']}: {e}")
+        return lst
+    lst['changed'] = response.status_code not in (200, 204)
+    return lst
+
+def upload_entities(api_key, entities, label=LIST_LABEL, diff=DIFF_MODE):
+    previous_lists = load_list_state(label) if diff else []
+    lists = plan_lists(entities, previous_lists, label)
+    changed = [lst for lst in lists if lst['changed']]
+    print(f'{len(entities)} entities in {len(lists)} lists, {len(changed)} to upload')
+
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            list(executor.map(lambda lst: upload_list(api_key, lst), changed))
+    finally:
+        # Lists created before an error must reach the state, or the next run would create them again.
+        # A list that failed to upload keeps its old content in the state so the next run retries it.
+        failed = [lst for lst in lists if lst['changed']]
+        for lst in failed:
+            previous = next((p for p in previous_lists if lst['id'] is not None and p['id'] == lst['id']), None)
+            lst['entities'] = previous['entities'] if previous else []
+        save_list_state(label, [lst for lst in lists if lst['id'] is not None or lst['entities']])
+    if failed:
+        print(f'{len(failed)} lists failed to upload; run again to retry them.')
+    return lists
+
 def main():
-    df = pd.read_csv(CSV_FILE_PATH)
-    query_list = df.iloc[:, 0].tolist()
-    payload = build_payload(query_list, API_KEY)
-    response = post_payload(API_KEY, payload)
-    print(response.text)
+    entities = process_queries(read_queries(CSV_FILE_PATH), API_KEY)
+    upload_entities(API_KEY, entities)
 
 if __name__ == '__main__':
     main()
@@ -9,6 +9,7 @@ This script handles deduplication using:
 
 Requirements:
     pip install requests python-dateutil python-dotenv
+    pip install orjson  # optional, faster JSON decoding/encoding (msgspec also works)
 """
 
 import json
@@ -23,6 +24,36 @@ import csv
 from collections import defaultdict
 from difflib import SequenceMatcher
 
+# Optional fast JSON backends (pip install orjson or msgspec), decoding straight from the response bytes.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def json_loads(data):
+    if orjson:
+        return orjson.loads(data)
+    if msgspec:
+        return msgspec.json.decode(data)
+    return json.loads(data)
+
+
+def json_dumps(obj, pretty=False):
+    """Encode obj as UTF-8 JSON bytes, compact unless pretty is set."""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if msgspec:
+        encoded = msgspec.json.encode(obj)
+        return msgspec.json.format(encoded, indent=2) if pretty else encoded
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -285,7 +316,7 @@ class FeedlySearchClient:
                 )
                 response.raise_for_status()
                 
-                data = response.json()
+                data = json_loads(response.content)
                 items = data.get("items", [])
                 
                 if not items:
@@ -428,19 +459,20 @@ class FeedlySearchClient:
             "deduplication_stats": self.stats
         }
     
-    def save_results(self, output_file: str, format: str = "json"):
+    def save_results(self, output_file: str, format: str = "json", pretty: bool = False):
         """
         Save deduplicated results to a file.
         
         Args:
             output_file: Path to output file
             format: Output format ('json' or 'csv')
+            pretty: Indent JSON output instead of writing it compact
         """
         results = self.get_deduplicated_results()
         
         if format == "json":
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(results, f, indent=2, ensure_ascii=False)
+            with open(output_file, 'wb') as f:
+                f.write(json_dumps(results, pretty=pretty))
             logger.info(f"Results saved to {output_file}")
             
         elif format == "csv":
@@ -533,6 +565,7 @@ def main():
     query_file = os.getenv('FEEDLY_QUERY_FILE', 'search_query.json')
     output_file = os.getenv('FEEDLY_OUTPUT_FILE', 'feedly_results.json')
     output_format = os.getenv('FEEDLY_OUTPUT_FORMAT', 'json')
+    pretty_json = os.getenv('FEEDLY_PRETTY_JSON', 'false').lower() == 'true'
     days = int(os.getenv('FEEDLY_SEARCH_DAYS', '7'))
     count = int(os.getenv('FEEDLY_SEARCH_COUNT', '100'))
     max_pages = int(os.getenv('FEEDLY_MAX_PAGES', '5'))
@@ -601,7 +634,7 @@ def main():
     logger.info("=" * 50)
     
     # Save results
-    client.save_results(output_file, format=output_format)
+    client.save_results(output_file, format=output_format, pretty=pretty_json)
     
     # Save seen entries to database
     client.save_seen_entries()
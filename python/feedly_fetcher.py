@@ -1,10 +1,16 @@
+import os
+import re
 import sys
 import time
+import threading
 import requests
 import csv
 import json
+import sqlite3
 import pymysql
 import configparser
+import feedly_json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 
@@ -31,13 +37,90 @@ def flatten_json(d, prefix='', separator='_', max_depth=None, depth=0):
 
     return flattened
 
+class SyncState:
+    """Per-stream crawl cursor persisted in a local SQLite database.
+
+    The cursor is the highest `crawled` timestamp already synced for a stream,
+    together with the IDs of the articles crawled at exactly that timestamp, so
+    the next run can re-request the boundary and drop what it already has.
+    """
+
+    def __init__(self, path='feedly_sync_state.db'):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS stream_cursor (
+                stream_id TEXT PRIMARY KEY,
+                crawled INTEGER NOT NULL,
+                boundary_ids TEXT NOT NULL,
+                updated_at INTEGER NOT NULL
+            )
+        ''')
+        self.connection.commit()
+
+    def get_cursor(self, stream_id):
+        row = self.connection.execute(
+            'SELECT crawled, boundary_ids FROM stream_cursor WHERE stream_id = ?', (stream_id,)
+        ).fetchone()
+        if row is None:
+            return None, set()
+        return row[0], set(json.loads(row[1]))
+
+    def select_delta(self, article_list, cursor, boundary_ids):
+        if cursor is None:
+            return article_list
+        return [
+            article for article in article_list
+            if article.get('crawled', 0) > cursor
+            or (article.get('crawled', 0) == cursor and article['id'] not in boundary_ids)
+        ]
+
+    def advance(self, stream_id, article_list, cursor, boundary_ids):
+        if not article_list:
+            return
+        new_cursor = max(article.get('crawled', 0) for article in article_list)
+        new_boundary_ids = {article['id'] for article in article_list if article.get('crawled', 0) == new_cursor}
+        if new_cursor == cursor:
+            new_boundary_ids |= boundary_ids
+
+        with self.connection:
+            self.connection.execute('''
+                INSERT INTO stream_cursor (stream_id, crawled, boundary_ids, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(stream_id) DO UPDATE SET
+                    crawled = excluded.crawled,
+                    boundary_ids = excluded.boundary_ids,
+                    updated_at = excluded.updated_at
+            ''', (stream_id, new_cursor, json.dumps(sorted(new_boundary_ids)), int(time.time() * 1000)))
+
+    def close(self):
+        self.connection.close()
+
+
+class RateLimiter:
+    """Spaces out requests so that all worker threads together stay under a requests-per-second budget."""
+
+    def __init__(self, requests_per_second=None):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        with self.lock:
+            slot = max(self.next_slot, time.monotonic())
+            self.next_slot = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
 class FeedlyFetcher:
-    def __init__(self, token, stream_id, article_count):
+    def __init__(self, token, stream_id, article_count, rate_limiter=None):
         self.token = token
         self.stream_id = stream_id
         self.article_count = article_count
         self.url = f'https://feedly.com/v3/streams/contents?streamId={stream_id}&count={article_count}'
         self.headers = {'Authorization': f'Bearer {token}'}
+        self.rate_limiter = rate_limiter
+        self.request_count = 0
 
     def fetch_articles(self, fetch_all=False, last_timestamp=None):
         all_articles = []
@@ -50,43 +133,64 @@ class FeedlyFetcher:
             if continuation is not None:
                 params['continuation'] = continuation
 
+            if self.rate_limiter is not None:
+                self.rate_limiter.wait()
             response = requests.get(self.url, headers=self.headers, params=params)
+            self.request_count += 1
             response.raise_for_status()
-            response_dict = response.json()
+            response_dict = feedly_json.loads(response.content)
 
             all_articles.extend(response_dict.get('items', []))
             continuation = response_dict.get('continuation')
-            print(f'Retrieved {len(all_articles)} articles')
+            print(f'Retrieved {len(all_articles)} articles from {self.stream_id}')
             if not fetch_all or continuation is None:
                 break
 
         return all_articles
 
-    def save_to_csv(self, article_list, max_depth, columns):
+    def save_to_csv(self, article_list, max_depth, columns, append=False, filename='article_data.csv'):
         if not article_list:
             print('No articles were fetched or processed. Exiting.')
             sys.exit(0)
 
-        flattened_articles = (flatten_json(article, max_depth=max_depth) for article in article_list)
+        # A list, not a generator: deriving the header must not use up the rows.
+        flattened_articles = [flatten_json(article, max_depth=max_depth) for article in article_list]
         fieldnames = columns if columns else sorted(list(set().union(*(article.keys() for article in flattened_articles))))
 
-        with open('article_data.csv', 'w', newline='', encoding='utf-8') as csvfile:
+        # When appending, keep the header of the existing file so rows line up.
+        write_header = True
+        if append and os.path.exists(filename):
+            with open(filename, newline='', encoding='utf-8') as csvfile:
+                existing_header = next(csv.reader(csvfile), None)
+            if existing_header:
+                fieldnames = existing_header
+                write_header = False
+
+        with open(filename, 'a' if append else 'w', newline='', encoding='utf-8') as csvfile:
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
+            if write_header:
+                writer.writeheader()
             for article in flattened_articles:
                 writer.writerow({k: article[k] for k in fieldnames if k in article})
 
-        print('Article data has been successfully saved to "article_data.csv"')
+        print(f'Article data has been successfully saved to "{filename}"')
 
-    def save_to_json(self, article_list):
+    def save_to_json(self, article_list, upsert=False, filename='article_data.json', pretty=False):
         if not article_list:
             print('No articles were fetched. Exiting.')
             sys.exit(0)
 
-        with open('article_data.json', 'w', encoding='utf-8') as jsonfile:
-            json.dump(article_list, jsonfile, ensure_ascii=False, indent=2)
+        # Merge into the existing export, replacing articles with the same id.
+        if upsert and os.path.exists(filename):
+            with open(filename, 'rb') as jsonfile:
+                existing_articles = {article['id']: article for article in feedly_json.load(jsonfile)}
+            existing_articles.update((article['id'], article) for article in article_list)
+            article_list = list(existing_articles.values())
 
-        print('Article data has been successfully saved to "article_data.json"')
+        with open(filename, 'wb') as jsonfile:
+            feedly_json.dump(article_list, jsonfile, pretty=pretty)
+
+        print(f'Article data has been successfully saved to "{filename}"')
 
     def save_to_mysql(self, article_list, host, user, password, database_name, table_name, columns):
         if not article_list:
@@ -116,6 +220,14 @@ class FeedlyFetcher:
         ]
         create_table_query = f"CREATE TABLE IF NOT EXISTS `{table_name}` ({', '.join(column_names_types)}) ROW_FORMAT=DYNAMIC;"
         cursor.execute(create_table_query)
+
+        # A table from an earlier run may predate new columns (a changed 'columns' setting, or stream_id
+        # once several streams are fetched); add the missing ones so the inserts do not fail.
+        cursor.execute(f"SHOW COLUMNS FROM `{table_name}`")
+        existing_columns = {row[0] for row in cursor.fetchall()}
+        for column_name in columns:
+            if column_name not in existing_columns:
+                cursor.execute(f"ALTER TABLE `{table_name}` ADD COLUMN `{column_name}` TEXT")
         connection.commit()
 
         # Now we insert the data
@@ -127,6 +239,152 @@ class FeedlyFetcher:
         connection.commit()
         print('Article data has been successfully saved to MySQL')
 
+    def save_to_sqlite(self, article_list, path, table_name, columns, fts=False, batch_size=1000, max_depth=None,
+                       key_columns=('id',)):
+        if not article_list:
+            print('No articles were fetched. Exiting.')
+            sys.exit(0)
+
+        flattened_articles = [flatten_json(article, max_depth=max_depth) for article in article_list]
+
+        # Without configured columns every flattened key is stored, as in save_to_csv.
+        # Work on a copy so the caller's list is never modified.
+        columns = list(columns) if columns else sorted(set().union(*(article.keys() for article in flattened_articles)))
+        # key_columns are the unique key used for upserts: id, or (stream_id, id) when several
+        # streams share the table, so an article on two boards is stored once per stream.
+        # FTS needs title and summary.
+        key_columns = list(key_columns)
+        columns = [column for column in key_columns if column not in columns] + columns
+        if fts:
+            columns += [column for column in ('title', 'summary_content') if column not in columns]
+
+        connection = sqlite3.connect(path)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+
+        with connection:
+            prepare_article_table(connection, table_name, columns, key_columns)
+
+        if fts:
+            # External-content FTS5 index kept in sync with the article table by triggers. It is keyed on
+            # the INTEGER PRIMARY KEY alias, which VACUUM never renumbers.
+            fts_table = f'{table_name}_fts'
+            fts_exists = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts_table,)
+            ).fetchone()
+            connection.executescript(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS "{fts_table}" USING fts5(
+                    title, summary_content, content="{table_name}", content_rowid='{ROWID_COLUMN}'
+                );
+                CREATE TRIGGER IF NOT EXISTS "{table_name}_ai" AFTER INSERT ON "{table_name}" BEGIN
+                    INSERT INTO "{fts_table}" (rowid, title, summary_content)
+                    VALUES (new.{ROWID_COLUMN}, new.title, new.summary_content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS "{table_name}_ad" AFTER DELETE ON "{table_name}" BEGIN
+                    INSERT INTO "{fts_table}" ("{fts_table}", rowid, title, summary_content)
+                    VALUES ('delete', old.{ROWID_COLUMN}, old.title, old.summary_content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS "{table_name}_au" AFTER UPDATE ON "{table_name}" BEGIN
+                    INSERT INTO "{fts_table}" ("{fts_table}", rowid, title, summary_content)
+                    VALUES ('delete', old.{ROWID_COLUMN}, old.title, old.summary_content);
+                    INSERT INTO "{fts_table}" (rowid, title, summary_content)
+                    VALUES (new.{ROWID_COLUMN}, new.title, new.summary_content);
+                END;
+            ''')
+            if not fts_exists:
+                # Index the rows stored before full-text search was switched on.
+                with connection:
+                    connection.execute(f'INSERT INTO "{fts_table}" ("{fts_table}") VALUES (\'rebuild\')')
+
+        column_names = ', '.join(f'"{column_name}"' for column_name in columns)
+        updates = ', '.join(f'"{column_name}" = excluded."{column_name}"' for column_name in columns if column_name not in key_columns)
+        conflict_target = ', '.join(f'"{column_name}"' for column_name in key_columns)
+        upsert_query = (
+            f'INSERT INTO "{table_name}" ({column_names}) VALUES ({", ".join(["?"] * len(columns))}) '
+            f'ON CONFLICT({conflict_target}) DO ' + (f'UPDATE SET {updates}' if updates else 'NOTHING')
+        )
+
+        def to_row(flattened):
+            values = (flattened.get(column_name) for column_name in columns)
+            # Values cut off at max_depth are still lists or dicts; store them as JSON text.
+            return tuple(json.dumps(value) if isinstance(value, (dict, list)) else value for value in values)
+
+        # All batches go into one transaction so the WAL is only synced once.
+        with connection:
+            for start in range(0, len(flattened_articles), batch_size):
+                connection.executemany(upsert_query, [to_row(article) for article in flattened_articles[start:start + batch_size]])
+
+        connection.close()
+        print(f'Article data has been successfully saved to SQLite ("{path}")')
+
+
+# INTEGER PRIMARY KEY alias of the SQLite article table; the FTS index refers to rows by it.
+ROWID_COLUMN = 'article_rowid'
+
+
+def article_table_matches(connection, table_name, key_columns):
+    """True if the table has the rowid alias and a unique index on exactly key_columns."""
+    table_info = connection.execute(f'PRAGMA table_info("{table_name}")').fetchall()
+    if not any(row[1] == ROWID_COLUMN and row[5] == 1 for row in table_info):
+        return False
+    for index in connection.execute(f'PRAGMA index_list("{table_name}")'):
+        if index[2]:
+            index_columns = [row[2] for row in connection.execute(f'PRAGMA index_info("{index[1]}")')]
+            if index_columns == list(key_columns):
+                return True
+    return False
+
+
+def prepare_article_table(connection, table_name, columns, key_columns):
+    """Create the article table, or bring an existing one up to date with columns and key_columns.
+
+    Missing columns are added in place. A table with another key, or without the rowid alias
+    (created by earlier versions of this script), is rebuilt once and its rows copied over.
+    """
+    def create(name, all_columns):
+        column_names_types = [f'"{ROWID_COLUMN}" INTEGER PRIMARY KEY'] + [f'"{column_name}"' for column_name in all_columns]
+        unique = ', '.join(f'"{column_name}"' for column_name in key_columns)
+        connection.execute(f'CREATE TABLE "{name}" ({", ".join(column_names_types)}, UNIQUE ({unique}))')
+
+    existing_columns = [row[1] for row in connection.execute(f'PRAGMA table_info("{table_name}")')]
+    if not existing_columns:
+        create(table_name, columns)
+        return
+
+    if article_table_matches(connection, table_name, key_columns):
+        for column_name in columns:
+            if column_name not in existing_columns:
+                connection.execute(f'ALTER TABLE "{table_name}" ADD COLUMN "{column_name}"')
+        return
+
+    kept_columns = [column_name for column_name in existing_columns if column_name != ROWID_COLUMN]
+    all_columns = kept_columns + [column_name for column_name in columns if column_name not in kept_columns]
+    copied = ', '.join(f'"{column_name}"' for column_name in kept_columns)
+    print(f'Rebuilding SQLite table "{table_name}" with a rowid column and a unique key on {", ".join(key_columns)}')
+    # sqlite3 does not open a transaction for DDL by itself; the whole rebuild must be atomic.
+    connection.execute('BEGIN')
+    # The FTS index and its triggers refer to the old rowids; they are recreated and rebuilt afterwards.
+    fts_table = f'{table_name}_fts'
+    for suffix in ('ai', 'ad', 'au'):
+        connection.execute(f'DROP TRIGGER IF EXISTS "{table_name}_{suffix}"')
+    connection.execute(f'DROP TABLE IF EXISTS "{fts_table}"')
+    create(f'{table_name}__rebuild', all_columns)
+    connection.execute(f'INSERT OR REPLACE INTO "{table_name}__rebuild" ({copied}) SELECT {copied} FROM "{table_name}"')
+    connection.execute(f'DROP TABLE "{table_name}"')
+    connection.execute(f'ALTER TABLE "{table_name}__rebuild" RENAME TO "{table_name}"')
+
+
+def partition_filename(base, extension, stream_id):
+    """Return the per-stream output file name, e.g. article_data_user_123_category_global.all.csv."""
+    slug = re.sub(r'[^A-Za-z0-9._-]+', '_', stream_id).strip('_')
+    return f'{base}_{slug}.{extension}'
+
+
+def fetch_stream(fetcher, fetch_all, last_timestamp):
+    started = time.perf_counter()
+    articles = fetcher.fetch_articles(fetch_all=fetch_all, last_timestamp=last_timestamp)
+    return articles, time.perf_counter() - started
+
 
 def main():
     config = configparser.ConfigParser()
@@ -136,37 +394,117 @@ def main():
     mysql_config = config['MySQL']
 
     token = feedly_config.get('token')
-    stream_id = feedly_config.get('stream_id')
+    stream_ids = [stream_id.strip() for stream_id in feedly_config.get('stream_id').split(',') if stream_id.strip()]
     article_count = feedly_config.getint('article_count', fallback=100)
     fetch_all = feedly_config.getboolean('fetch_all', fallback=False)
     hours_ago = feedly_config.getint('hours_ago', fallback=None)
     output_format = feedly_config.get('output_format', fallback='csv')
+    pretty_json = feedly_config.getboolean('pretty_json', fallback=False)
     max_depth = feedly_config.getint('max_depth', fallback=3)
-    columns = [column.strip() for column in feedly_config.get('columns', fallback='').split(',')]
+    columns = [column.strip() for column in feedly_config.get('columns', fallback='').split(',') if column.strip()]
+    sync_mode = feedly_config.get('sync_mode', fallback='window')
+    state_db = feedly_config.get('state_db', fallback='feedly_sync_state.db')
+    max_workers = feedly_config.getint('max_workers', fallback=4)
+    requests_per_second = feedly_config.getfloat('requests_per_second', fallback=None)
+    sqlite_path = config.get('SQLite', 'path', fallback='article_data.db')
+    sqlite_table = config.get('SQLite', 'table', fallback='articles')
+    sqlite_fts = config.getboolean('SQLite', 'fts', fallback=False)
+    incremental = sync_mode == 'incremental'
+    multi_stream = len(stream_ids) > 1
 
-    fetcher = FeedlyFetcher(token, stream_id, article_count)
     last_timestamp = None
 
     if hours_ago:
         hours_ago_ms = hours_ago * 3600 * 1000
         last_timestamp = int(time.time() * 1000) - hours_ago_ms
 
-    all_articles = fetcher.fetch_articles(fetch_all=fetch_all, last_timestamp=last_timestamp)
-
-    if output_format == 'csv':
-        fetcher.save_to_csv(all_articles, max_depth, columns)
-    elif output_format == 'json':
-        fetcher.save_to_json(all_articles)
-    elif output_format == 'sql':
-        fetcher.save_to_mysql(
-            all_articles, 
-            mysql_config['host'],
-            mysql_config['user'],
-            mysql_config['password'],
-            mysql_config['database'],
-            mysql_config['table'],
-            columns  # Pass the columns from the config here.
-        )
+    # Cursors are read and written on the main thread only; the workers just fetch.
+    cursors = {}
+    if incremental:
+        sync_state = SyncState(state_db)
+        cursors = {stream_id: sync_state.get_cursor(stream_id) for stream_id in stream_ids}
+        # The stream is returned newest first, so a partial fetch would leave a gap.
+        fetch_all = True
+
+    # In SQL, streams share one table and are told apart by a stream_id column.
+    # With no columns configured, stream_id is picked up from the articles like every other key.
+    if multi_stream and output_format in ('sql', 'sqlite') and columns and 'stream_id' not in columns:
+        columns = ['stream_id'] + columns
+
+    rate_limiter = RateLimiter(requests_per_second)
+    throughput = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for stream_id in stream_ids:
+            fetcher = FeedlyFetcher(token, stream_id, article_count, rate_limiter)
+            stream_timestamp = last_timestamp
+            cursor, _ = cursors.get(stream_id, (None, set()))
+            if cursor is not None:
+                # Step back one millisecond so articles crawled in the same millisecond
+                # as the cursor are fetched again; the boundary IDs drop those already synced.
+                stream_timestamp = cursor - 1
+            futures[executor.submit(fetch_stream, fetcher, fetch_all, stream_timestamp)] = fetcher
+
+        for future in as_completed(futures):
+            fetcher = futures[future]
+            stream_id = fetcher.stream_id
+            try:
+                all_articles, elapsed = future.result()
+            except requests.exceptions.RequestException as e:
+                print(f'Failed to fetch {stream_id}: {e}')
+                continue
+            throughput[stream_id] = (len(all_articles), fetcher.request_count, elapsed)
+
+            if incremental:
+                cursor, boundary_ids = cursors[stream_id]
+                all_articles = sync_state.select_delta(all_articles, cursor, boundary_ids)
+                print(f'{len(all_articles)} new articles in {stream_id} since the last sync')
+
+            if not all_articles:
+                print(f'No articles to save for {stream_id}')
+                continue
+
+            if output_format == 'csv':
+                filename = partition_filename('article_data', 'csv', stream_id) if multi_stream else 'article_data.csv'
+                fetcher.save_to_csv(all_articles, max_depth, columns, append=incremental, filename=filename)
+            elif output_format == 'json':
+                filename = partition_filename('article_data', 'json', stream_id) if multi_stream else 'article_data.json'
+                fetcher.save_to_json(all_articles, upsert=incremental, filename=filename, pretty=pretty_json)
+            elif output_format in ('sql', 'sqlite'):
+                if multi_stream:
+                    all_articles = [dict(article, stream_id=stream_id) for article in all_articles]
+                if output_format == 'sql':
+                    fetcher.save_to_mysql(
+                        all_articles,
+                        mysql_config['host'],
+                        mysql_config['user'],
+                        mysql_config['password'],
+                        mysql_config['database'],
+                        mysql_config['table'],
+                        columns  # Pass the columns from the config here.
+                    )
+                else:
+                    fetcher.save_to_sqlite(
+                        all_articles, sqlite_path, sqlite_table, columns, fts=sqlite_fts, max_depth=max_depth,
+                        key_columns=('stream_id', 'id') if multi_stream else ('id',)
+                    )
+
+            # Only move the cursor once the delta has been written to the sink.
+            if incremental:
+                sync_state.advance(stream_id, all_articles, cursor, boundary_ids)
+
+    if incremental:
+        sync_state.close()
+
+    print('\nPer-stream throughput:')
+    for stream_id in stream_ids:
+        if stream_id not in throughput:
+            print(f'  {stream_id}: failed')
+            continue
+        article_total, request_total, elapsed = throughput[stream_id]
+        rate = article_total / elapsed if elapsed else 0.0
+        print(f'  {stream_id}: {article_total} articles in {request_total} requests, {elapsed:.1f}s ({rate:.1f} articles/s)')
 
 
 if __name__ == '__main__':
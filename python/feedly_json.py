@@ -0,0 +1,53 @@
+"""JSON encoding/decoding shared by the Feedly scripts in this folder.
+
+orjson or msgspec is used when installed (`pip install orjson`), otherwise the
+standard library `json` module. Responses are decoded straight from the raw
+bytes (`response.content`) and output is written compact unless `pretty=True`.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def _json_dumps(obj, pretty=False):
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _orjson_dumps(obj, pretty=False):
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+
+
+def _msgspec_dumps(obj, pretty=False):
+    encoded = msgspec.json.encode(obj)
+    return msgspec.json.format(encoded, indent=2) if pretty else encoded
+
+
+# Backend name -> (loads, dumps). loads accepts bytes or str, dumps returns UTF-8 bytes.
+BACKENDS = {'json': (json.loads, _json_dumps)}
+if orjson is not None:
+    BACKENDS['orjson'] = (orjson.loads, _orjson_dumps)
+if msgspec is not None:
+    BACKENDS['msgspec'] = (msgspec.json.decode, _msgspec_dumps)
+
+BACKEND = next(name for name in ('orjson', 'msgspec', 'json') if name in BACKENDS)
+loads, dumps = BACKENDS[BACKEND]
+
+
+def load(file):
+    """Decode a JSON document from a file opened in binary mode."""
+    return loads(file.read())
+
+
+def dump(obj, file, pretty=False):
+    """Encode obj into a file opened in binary mode."""
+    file.write(dumps(obj, pretty=pretty))
@@ -1,55 +1,365 @@
 
+import os
+import json
+import gzip
+import time
+import random
+import hashlib
+import threading
 import requests
 import argparse
-import json
+import feedly_json
+from concurrent.futures import ThreadPoolExecutor
+
+class SearchCache:
+    """On-disk cache of search results with a TTL and size-bounded LRU eviction.
+
+    Each entry is one JSON file. Its modification time records when it was written
+    (for the TTL) and its access time is bumped on every hit (for LRU eviction).
+    """
+    def __init__(self, directory='.power_search_cache', ttl_hours=6, max_size_mb=500):
+        self.directory = directory
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_bytes = max_size_mb * 1024 * 1024
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, *parts):
+        # Canonical JSON (sorted keys, no whitespace) so equivalent queries hash the same.
+        canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            modified = os.path.getmtime(path)
+        except OSError:
+            return None
+        if time.time() - modified > self.ttl_seconds:
+            os.remove(path)
+            return None
+        with open(path, 'rb') as file:
+            articles = feedly_json.load(file)
+        os.utime(path, (time.time(), modified))
+        return articles
+
+    def put(self, key, articles):
+        path = self.path(key)
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'wb') as file:
+            feedly_json.dump(articles, file)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def evict(self):
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            stat = os.stat(path)
+            if now - stat.st_mtime > self.ttl_seconds:
+                os.remove(path)
+            else:
+                entries.append((stat.st_atime, stat.st_size, path))
+
+        # Drop least recently used entries until the cache fits its size budget.
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+class RequestScheduler:
+    """Paces search requests from Feedly's rate-limit headers and retries 429/5xx responses.
+
+    Feedly reports X-RateLimit-Limit, X-RateLimit-Count (requests used) and
+    X-RateLimit-Reset (seconds until the quota resets). Once the remaining quota drops
+    below `reserve` of the limit, the remaining requests are spread evenly over the time
+    left and the page size grows towards `max_page_size`, so fewer requests fetch the
+    same articles. Server errors and timeouts halve the page size down to `min_page_size`.
+    One scheduler can be shared by several threads.
+    """
+    def __init__(self, page_size=100, min_page_size=10, max_page_size=None, max_retries=5, reserve=0.1, verbose=False):
+        self.page_size = page_size
+        self.min_page_size = min(min_page_size, page_size)
+        self.max_page_size = max(max_page_size or page_size, page_size)
+        self.max_retries = max_retries
+        self.reserve = reserve
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.interval = 0.0
+        self.next_request = time.monotonic()
+        self.started = time.monotonic()
+        self.requests = 0
+        self.retries = 0
+        self.items = 0
+
+    def post(self, url, params, **kwargs):
+        """POST with pacing and retries. Returns the last response, or None if every attempt raised."""
+        response = None
+        for attempt in range(self.max_retries + 1):
+            self.wait_turn()
+            params['count'] = self.page_size
+            try:
+                response = requests.post(url, params=params, timeout=120, **kwargs)
+            except requests.exceptions.RequestException as e:
+                print(f"Request failed: {e}")
+                response = None
+            with self.lock:
+                self.requests += 1
+
+            if response is not None:
+                self.update_from_headers(response)
+                if response.status_code != 429 and response.status_code < 500:
+                    return response
+            if attempt == self.max_retries:
+                break
+
+            delay = self.retry_delay(response, attempt)
+            with self.lock:
+                self.retries += 1
+                if response is None or response.status_code >= 500:
+                    # Large pages are the usual cause of timeouts and server errors.
+                    self.page_size = max(self.min_page_size, self.page_size // 2)
+            if self.verbose:
+                status = response.status_code if response is not None else 'no response'
+                print(f"Got {status}, retrying in {delay:.1f}s with page size {self.page_size}")
+            time.sleep(delay)
+        return response
+
+    def retry_delay(self, response, attempt):
+        if response is not None and response.status_code == 429:
+            for header in ('Retry-After', 'X-RateLimit-Reset'):
+                value = response.headers.get(header, '')
+                if value.isdigit():
+                    return float(value) + random.uniform(0, 1)
+        # Exponential backoff with jitter so parallel workers do not retry in lockstep.
+        return 2 ** attempt * random.uniform(0.5, 1.5)
+
+    def update_from_headers(self, response):
+        try:
+            limit = int(response.headers['X-RateLimit-Limit'])
+            used = int(response.headers['X-RateLimit-Count'])
+            reset = float(response.headers['X-RateLimit-Reset'])
+        except (KeyError, ValueError):
+            return
+        remaining = max(limit - used, 0)
+        with self.lock:
+            if remaining <= limit * self.reserve:
+                self.interval = reset / max(remaining, 1)
+                self.next_request = max(self.next_request, time.monotonic() + self.interval)
+                self.page_size = min(self.max_page_size, self.page_size * 2)
+            else:
+                self.interval = 0.0
+
+    def wait_turn(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_request, now)
+            self.next_request = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def record_items(self, count):
+        with self.lock:
+            self.items += count
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.items / elapsed if elapsed else 0.0
+        return (f"{self.items} articles in {self.requests} requests ({self.retries} retries) over {elapsed:.1f}s: "
+                f"{rate:.1f} articles/s, final page size {self.page_size}")
+
+def newer_than_timestamp(days_ago, now=None):
+    """Epoch milliseconds days_ago days before now, for the newerThan parameter; None without days_ago."""
+    if days_ago is None:
+        return None
+    now = int(time.time() * 1000) if now is None else now
+    return now - days_ago * 24 * 60 * 60 * 1000
 
 class FeedlyPowerSearch:
-    def __init__(self, token, query_file_path, article_count=100, days_ago=None, verbose=False):
+    def __init__(self, token, query_file_path, article_count=100, days_ago=None, verbose=False, cache=None, scheduler=None):
         self.token = token
-        with open(query_file_path, 'r') as file:
-            self.query_body = json.load(file)
+        with open(query_file_path, 'rb') as file:
+            self.query_body = feedly_json.load(file)
         self.article_count = article_count
         self.url = 'https://feedly.com/v3/search/contents'
         self.headers = {'Authorization': f'Bearer {token}'}
         self.days_ago = days_ago
         self.verbose = verbose
+        self.cache = cache
+        self.scheduler = scheduler or RequestScheduler(page_size=article_count, verbose=verbose)
 
-    def search_articles(self):
+    def search_articles(self, windows=1, max_workers=4, refresh=False):
+        if self.cache is None:
+            return self.search_uncached(windows, max_workers)
+
+        cache_key = self.cache.key(self.query_body, self.article_count, self.days_ago)
+        if not refresh:
+            articles = self.cache.get(cache_key)
+            if articles is not None:
+                print(f"Loaded {len(articles)} articles from the cache (use --refresh to query the API again)")
+                return articles
+
+        articles = self.search_uncached(windows, max_workers)
+        # Failed searches come back empty, so only non-empty results are cached.
+        if articles:
+            self.cache.put(cache_key, articles)
+        return articles
+
+    def search_uncached(self, windows=1, max_workers=4):
+        if self.days_ago is None or windows <= 1:
+            return self.search_window(newer_than=newer_than_timestamp(self.days_ago)) or []
+        return self.search_windows(windows, max_workers)
+
+    def search_windows(self, windows, max_workers=4):
+        """Split the days_ago range into time windows and search them concurrently."""
+        now = int(time.time() * 1000)
+        start = newer_than_timestamp(self.days_ago, now)
+        bounds = [start + (now - start) * index // windows for index in range(windows + 1)]
+        # Window i covers bounds[i] to bounds[i + 1] + 1 ms, so an article published exactly on a
+        # boundary is found whether the API treats the bounds as inclusive or exclusive.
+        # The newest window is left open-ended.
+        slices = [(bounds[index], bounds[index + 1] + 1 if index < windows - 1 else None) for index in range(windows)]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(lambda window: self.search_window(*window), slices))
+
+        if any(result is None for result in results):
+            return []
+
+        # Neighbouring windows overlap by a millisecond, so merge on entry id and restore publication order.
+        merged = {}
+        for window_articles in results:
+            for article in window_articles:
+                merged.setdefault(article['id'], article)
+        return sorted(merged.values(), key=lambda article: article.get('published', 0), reverse=True)
+
+    def search_window(self, newer_than=None, older_than=None):
+        """Follow continuation tokens for one time window. Returns None if a request fails."""
         all_articles = []
-        continuation = None
+        for page in self.iter_pages(newer_than, older_than):
+            if page is None:
+                return None
+            all_articles.extend(page[0])
+        return all_articles
+
+    def stream_search(self, exporter, resume=False):
+        """Append each page to an NdjsonExport as it arrives instead of keeping results in memory."""
+        state = exporter.resume() if resume else None
+        if state is None:
+            state = exporter.start(newer_than_timestamp(self.days_ago))
+        elif self.verbose:
+            print(f"Resuming after {state['items']} articles")
+
+        for page in self.iter_pages(state['newer_than'], continuation=state['continuation']):
+            if page is None:
+                print(f"Search interrupted. Run again with --resume to continue from {exporter.state_file}.")
+                return exporter.items
+            items, continuation = page
+            exporter.write_page(items, continuation)
+
+        exporter.finish()
+        return exporter.items
+
+    def iter_pages(self, newer_than=None, older_than=None, continuation=None):
+        """Yield (items, continuation) per page, or a final None if a request fails."""
+        fetched = 0
 
         while True:
-            params = {'count': self.article_count}
-            
-            # Convert days to milliseconds for newerThan parameter
-            if self.days_ago is not None:
-                milliseconds = self.days_ago * 24 * 60 * 60 * 1000
-                params['newerThan'] = milliseconds
+            # The scheduler fills in 'count' with its current page size.
+            params = {}
+            if newer_than is not None:
+                params['newerThan'] = newer_than
+            if older_than is not None:
+                params['olderThan'] = older_than
 
             if continuation is not None:
                 params['continuation'] = continuation
 
-            response = requests.post(self.url, headers=self.headers, params=params, json=self.query_body)
-            if response.status_code != 200:
+            response = self.scheduler.post(self.url, params, headers=self.headers, json=self.query_body)
+            if response is None or response.status_code != 200:
                 print("Error occurred while fetching articles. Please check your token and query.")
-                return []
+                yield None
+                return
 
-            response_dict = response.json()
-            all_articles.extend(response_dict.get('items', []))
+            response_dict = feedly_json.loads(response.content)
+            items = response_dict.get('items', [])
             continuation = response_dict.get('continuation')
+            fetched += len(items)
+            self.scheduler.record_items(len(items))
             
             # Print verbose feedback if verbose mode is enabled
             if self.verbose:
-                print(f"Fetched {len(all_articles)} articles")
+                print(f"Fetched {fetched} articles")
+
+            yield items, continuation
  
             if continuation is None:
                 break
 
-        return all_articles
+class NdjsonExport:
+    """Appends search results to an NDJSON file (optionally gzipped) one page at a time.
+
+    After every page a sidecar file (<filename>.state.json) records the continuation
+    token, the number of items written and the file size, so an interrupted search
+    can be resumed without losing or duplicating articles.
+    """
+    def __init__(self, filename, compress=False):
+        self.filename = filename
+        self.compress = compress
+        self.state_file = f'{filename}.state.json'
+        self.state = None
+
+    @property
+    def items(self):
+        return self.state['items'] if self.state else 0
+
+    def start(self, newer_than):
+        open(self.filename, 'wb').close()
+        self.state = {'newer_than': newer_than, 'continuation': None, 'items': 0, 'offset': 0}
+        self.save_state()
+        return self.state
 
-def export_to_json(data, filename):
-    with open(filename, 'w', encoding='utf-8') as jsonfile:
-        json.dump(data, jsonfile, ensure_ascii=False, indent=4)
+    def resume(self):
+        if not os.path.exists(self.state_file):
+            print(f"No state file {self.state_file} found, starting a new search.")
+            return None
+        with open(self.state_file, 'rb') as file:
+            self.state = feedly_json.load(file)
+        # Drop anything written after the last recorded page.
+        with open(self.filename, 'ab') as file:
+            file.truncate(self.state['offset'])
+        return self.state
+
+    def write_page(self, items, continuation):
+        lines = b''.join(feedly_json.dumps(item) + b'\n' for item in items)
+        with open(self.filename, 'ab') as file:
+            # Each page becomes its own gzip member; concatenated members are a valid gzip file.
+            file.write(gzip.compress(lines) if self.compress else lines)
+            file.flush()
+            os.fsync(file.fileno())
+            offset = file.tell()
+        self.state.update(continuation=continuation, items=self.state['items'] + len(items), offset=offset)
+        self.save_state()
+
+    def save_state(self):
+        temp_path = f'{self.state_file}.tmp'
+        with open(temp_path, 'wb') as file:
+            feedly_json.dump(self.state, file)
+        os.replace(temp_path, self.state_file)
+
+    def finish(self):
+        os.remove(self.state_file)
+
+def export_to_json(data, filename, pretty=False):
+    with open(filename, 'wb') as jsonfile:
+        feedly_json.dump(data, jsonfile, pretty=pretty)
 
 if __name__ == "__main__":
     # Initialize the argument parser
@@ -57,18 +367,43 @@ if __name__ == "__main__":
     parser.add_argument('--token', help='Your Feedly Enterprise Token.', required=True)
     parser.add_argument('--query_file', help='Path to the JSON query file for the search payload.', required=True)
     parser.add_argument('-o', '--output', default="output.json", help='Output filename. Default is output.json.')
-    parser.add_argument('-d', '--days_ago', type=int, help='Number of days ago to set the newerThan parameter. Converts days to milliseconds.')
+    parser.add_argument('-d', '--days_ago', type=int, help='Only fetch articles newer than this many days ago (sent as an epoch timestamp in newerThan).')
+    parser.add_argument('--page_size', type=int, default=100, help='Articles requested per page. Default is 100.')
+    parser.add_argument('--max_page_size', type=int, help='Largest page size the scheduler may grow to when the rate-limit quota runs low. Default is --page_size.')
+    parser.add_argument('--max_retries', type=int, default=5, help='Retries per page on 429, 5xx or network errors. Default is 5.')
+    parser.add_argument('-w', '--windows', type=int, default=1, help='Split --days_ago into this many time windows and search them concurrently. Default is 1.')
+    parser.add_argument('--workers', type=int, default=4, help='Maximum number of windows searched at the same time. Default is 4.')
+    parser.add_argument('--refresh', action='store_true', help='Ignore cached results and query the API again.')
+    parser.add_argument('--no_cache', action='store_true', help='Disable the on-disk result cache.')
+    parser.add_argument('--cache_dir', default='.power_search_cache', help='Directory of the result cache. Default is .power_search_cache.')
+    parser.add_argument('--cache_ttl_hours', type=float, default=6, help='Hours a cached result stays valid. Default is 6.')
+    parser.add_argument('--cache_size_mb', type=float, default=500, help='Maximum size of the result cache in MB. Default is 500.')
+    parser.add_argument('--stream', action='store_true', help='Append each page to the output as NDJSON while searching, so long searches use little memory and can be resumed.')
+    parser.add_argument('--gzip', action='store_true', help='With --stream, gzip the NDJSON output.')
+    parser.add_argument('--resume', action='store_true', help='With --stream, continue an interrupted search from its state file.')
+    parser.add_argument('--pretty', action='store_true', help='Indent the JSON output. Default is compact output.')
     parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose mode for detailed feedback.')
 
     # Parse the arguments
     args = parser.parse_args()
 
-    searcher = FeedlyPowerSearch(args.token, args.query_file, days_ago=args.days_ago, verbose=args.verbose)
-    articles = searcher.search_articles()
+    cache = None if args.no_cache else SearchCache(args.cache_dir, args.cache_ttl_hours, args.cache_size_mb)
+    scheduler = RequestScheduler(args.page_size, max_page_size=args.max_page_size, max_retries=args.max_retries, verbose=args.verbose)
+    searcher = FeedlyPowerSearch(args.token, args.query_file, article_count=args.page_size, days_ago=args.days_ago, verbose=args.verbose, cache=cache, scheduler=scheduler)
 
-    if articles:
-        print(f"Found {len(articles)} articles!")
-        export_to_json(articles, args.output)
-        print(f"Results exported to {args.output}!")
+    if args.stream:
+        exporter = NdjsonExport(args.output, compress=args.gzip)
+        article_count = searcher.stream_search(exporter, resume=args.resume)
+        print(f"Wrote {article_count} articles to {args.output}!")
     else:
-        print("No articles found.")
+        articles = searcher.search_articles(windows=args.windows, max_workers=args.workers, refresh=args.refresh)
+
+        if articles:
+            print(f"Found {len(articles)} articles!")
+            export_to_json(articles, args.output, pretty=args.pretty)
+            print(f"Results exported to {args.output}!")
+        else:
+            print("No articles found.")
+
+    if scheduler.requests:
+        print(f"Throughput: {scheduler.summary()}")
@@ -0,0 +1,144 @@
+import os
+import glob
+import time
+import random
+import asyncio
+import argparse
+import aiohttp
+import feedly_json
+from feedly_power_search import export_to_json, newer_than_timestamp
+
+SEARCH_URL = 'https://feedly.com/v3/search/contents'
+
+
+class FeedlyPowerSearchBatch:
+    def __init__(self, token, article_count=100, days_ago=None, concurrency=8, per_host=8, max_retries=5, verbose=False):
+        self.headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+        self.article_count = article_count
+        self.days_ago = days_ago
+        # One cutoff for the whole batch, so every query covers the same range.
+        self.newer_than = newer_than_timestamp(days_ago)
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.max_retries = max_retries
+        self.verbose = verbose
+
+    async def post_search(self, session, params, body):
+        """POST one search page, backing off on 429, 5xx and network errors. Returns None once retries are exhausted."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with session.post(SEARCH_URL, params=params, data=body) as response:
+                    if response.status == 200:
+                        return feedly_json.loads(await response.read())
+                    retryable = response.status == 429 or response.status >= 500
+                    if not retryable or attempt == self.max_retries:
+                        print(f"Search failed with status {response.status}: {await response.text()}")
+                        return None
+                    # Honour Retry-After when the server sends one, otherwise back off exponentially with jitter.
+                    retry_after = response.headers.get('Retry-After')
+                    delay = float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt + random.uniform(0, 1)
+                    reason = response.status
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries:
+                    print(f"Search failed: {e!r}")
+                    return None
+                delay = 2 ** attempt + random.uniform(0, 1)
+                reason = repr(e)
+            if self.verbose:
+                print(f"Got {reason}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def search(self, session, query_body, newer_than=None):
+        body = feedly_json.dumps(query_body)
+        all_articles = []
+        continuation = None
+
+        while True:
+            params = {'count': str(self.article_count)}
+            if newer_than is not None:
+                params['newerThan'] = str(newer_than)
+            if continuation is not None:
+                params['continuation'] = continuation
+
+            response_dict = await self.post_search(session, params, body)
+            if response_dict is None:
+                return None
+            all_articles.extend(response_dict.get('items', []))
+            continuation = response_dict.get('continuation')
+            if continuation is None:
+                return all_articles
+
+    async def run_query(self, session, semaphore, query_file, output_dir, pretty):
+        name = os.path.splitext(os.path.basename(query_file))[0]
+        output_file = os.path.join(output_dir, f'{name}.json')
+        entry = {'query_file': query_file, 'output': output_file}
+
+        started = time.perf_counter()
+        # A bad query file, an unparsable response or a failed write fails this query only;
+        # the other queries keep running and the index still lists every file.
+        try:
+            async with semaphore:
+                started = time.perf_counter()
+                with open(query_file, 'rb') as file:
+                    query_body = feedly_json.load(file)
+                articles = await self.search(session, query_body, self.newer_than)
+                entry['seconds'] = round(time.perf_counter() - started, 2)
+
+            if articles is None:
+                entry.update(status='failed', articles=0, output=None)
+            else:
+                await asyncio.to_thread(export_to_json, articles, output_file, pretty)
+                entry.update(status='ok', articles=len(articles))
+        except Exception as e:
+            entry.setdefault('seconds', round(time.perf_counter() - started, 2))
+            entry.update(status='failed', articles=0, output=None, error=repr(e))
+            print(f"{name}: {e!r}")
+        print(f"{name}: {entry['status']}, {entry['articles']} articles in {entry['seconds']}s")
+        return entry
+
+    async def run(self, query_files, output_dir, pretty=False):
+        os.makedirs(output_dir, exist_ok=True)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # One pooled session for all queries; the connector caps open connections per host.
+        connector = aiohttp.TCPConnector(limit_per_host=self.per_host)
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=120)
+        async with aiohttp.ClientSession(headers=self.headers, connector=connector, timeout=timeout) as session:
+            return await asyncio.gather(*(
+                self.run_query(session, semaphore, query_file, output_dir, pretty) for query_file in query_files
+            ))
+
+
+if __name__ == "__main__":
+    # Initialize the argument parser
+    parser = argparse.ArgumentParser(description='Run a directory of Power Search query files concurrently and export one JSON file per query.')
+    parser.add_argument('--token', help='Your Feedly Enterprise Token.', required=True)
+    parser.add_argument('--query_dir', help='Directory containing the JSON query files (*.json).', required=True)
+    parser.add_argument('-o', '--output_dir', default='results', help='Directory for the per-query results and index.json. Default is results.')
+    parser.add_argument('-d', '--days_ago', type=int, help='Only fetch articles newer than this many days ago (sent as an epoch timestamp in newerThan).')
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help='Maximum number of queries running at the same time. Default is 8.')
+    parser.add_argument('--per_host', type=int, default=8, help='Maximum number of open connections to feedly.com. Default is 8.')
+    parser.add_argument('--max_retries', type=int, default=5, help='Retries per page on 429 or 5xx responses. Default is 5.')
+    parser.add_argument('--pretty', action='store_true', help='Indent the JSON output. Default is compact output.')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose mode for detailed feedback.')
+
+    # Parse the arguments
+    args = parser.parse_args()
+
+    query_files = sorted(glob.glob(os.path.join(args.query_dir, '*.json')))
+    if not query_files:
+        print(f"No query files found in {args.query_dir}.")
+    else:
+        batch = FeedlyPowerSearchBatch(
+            args.token,
+            days_ago=args.days_ago,
+            concurrency=args.concurrency,
+            per_host=args.per_host,
+            max_retries=args.max_retries,
+            verbose=args.verbose
+        )
+        started = time.perf_counter()
+        index = asyncio.run(batch.run(query_files, args.output_dir, pretty=args.pretty))
+        index_file = os.path.join(args.output_dir, 'index.json')
+        export_to_json(index, index_file, pretty=True)
+        failed = sum(1 for entry in index if entry['status'] != 'ok')
+        print(f"Ran {len(index)} queries ({failed} failed) in {time.perf_counter() - started:.1f}s. Index written to {index_file}!")
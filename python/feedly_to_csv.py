@@ -1,11 +1,32 @@
+import os
+import io
 import sys
 import time
+import json
+import glob
+import gzip
+import hashlib
 import requests
 import csv
 import re
 import html
+import queue
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
+from functools import lru_cache
+
+try:
+    import zstandard  # Optional: only needed for compression='zstd' (pip install zstandard)
+except ImportError:
+    zstandard = None
+
+CATALOG_FILE = 'column_catalog.json'
+NUMBERED_COLUMN = re.compile(r'([^_]+)_(\d+)')
+COMPRESSION_EXTENSIONS = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+# Sharded output is handed to the writer threads in chunks of about this many characters
+SHARD_CHUNK_CHARS = 1024 * 1024
+SHARD_QUEUE_CHUNKS = 4
 
 def flatten_json(d, prefix='', separator='_', max_depth=5, depth=0):
     flattened = {}
@@ -31,6 +52,8 @@ def fetch_articles(token, stream_id, article_count, fetch_all=False, last_timest
     url = f'https://feedly.com/v3/streams/contents?streamId={stream_id}&count={article_count}'
     headers = {'Authorization': f'Bearer {token}'}
     all_articles = []
+    seen = set()
+    duplicates = 0
     continuation = None
 
     while True:
@@ -44,70 +67,249 @@ def fetch_articles(token, stream_id, article_count, fetch_all=False, last_timest
         response.raise_for_status()
         response_dict = response.json()
 
-        all_articles.extend(response_dict.get('items', []))
+        # Pages can overlap, so duplicates are dropped as each page arrives
+        items = response_dict.get('items', [])
+        before = len(all_articles)
+        all_articles.extend(drop_duplicates(items, seen))
+        duplicates += len(items) - (len(all_articles) - before)
         continuation = response_dict.get('continuation')
         print(f'Retrieved {len(all_articles)} articles')
         if not fetch_all or continuation is None:
             break
 
+    if duplicates:
+        print(f'Dropped {duplicates} duplicate articles')
     return all_articles
 
+class NonPrintableTable(dict):
+    """str.translate table that deletes non-printable characters.
+
+    Entries are filled in the first time a code point is seen, so the table only
+    ever holds the characters that actually occur in the export.
+    """
+    def __missing__(self, codepoint):
+        value = codepoint if chr(codepoint).isprintable() else None
+        self[codepoint] = value
+        return value
+
+NON_PRINTABLE_TABLE = NonPrintableTable()
+
 def clean_text(text):
     # Decode HTML entities
     text = html.unescape(text)
     # Remove any remaining non-printable characters
-    return ''.join(char for char in text if char.isprintable())
+    if text.isprintable():
+        return text
+    return text.translate(NON_PRINTABLE_TABLE)
+
+@lru_cache(maxsize=4096)
+def minute_to_date(epoch_minute):
+    return datetime.fromtimestamp(epoch_minute * 60).strftime('%Y-%m-%d %H:%M')
 
 def epoch_to_date(epoch_ms):
-    return datetime.fromtimestamp(epoch_ms / 1000).strftime('%Y-%m-%d %H:%M:%S')
+    # Articles in one export cluster around the same minutes, so only the seconds
+    # are formatted per row and the rest of the timestamp comes from the cache.
+    epoch_minute, seconds = divmod(epoch_ms // 1000, 60)
+    return f'{minute_to_date(epoch_minute)}:{seconds:02d}'
+
+def transform_rows(flattened_articles, fieldnames):
+    """Yield CSV rows with titles cleaned and epoch timestamps formatted."""
+    clean_title = 'title' in fieldnames
+    date_fields = [field for field in ('published', 'crawled') if field in fieldnames]
+    for article in flattened_articles:
+        row = {k: article.get(k, '') for k in fieldnames}
+        if clean_title:
+            row['title'] = clean_text(row['title'])
+        for field in date_fields:
+            # Convert epoch time to readable date
+            if row[field] != '':
+                row[field] = epoch_to_date(int(row[field]))
+        yield row
+
+def article_digest(article_id):
+    """64-bit digest of an article id, used as a compact deduplication key."""
+    return int.from_bytes(hashlib.blake2b(article_id.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def drop_duplicates(articles, seen=None):
+    # An article id always maps to the same article, so the id alone is the key;
+    # keeping only its digest avoids holding every id and title string in memory.
+    # Pass the same seen set for every page to deduplicate across pages.
+    seen = set() if seen is None else seen
+    for article in articles:
+        digest = article_digest(article['id'])
+        if digest not in seen:
+            seen.add(digest)
+            yield article
+
+def open_output(path, compression=None):
+    """Open a binary output file that compresses with gzip or zstd while it is written."""
+    if compression == 'gzip':
+        return gzip.open(path, 'wb')
+    if compression == 'zstd':
+        return zstandard.open(path, 'wb')
+    return open(path, 'wb')
 
-def save_to_csv(article_list, columns=None):
+def write_shard(path, chunks, compression):
+    """Compress encoded CSV chunks from the chunks queue into path until None arrives."""
+    finished = False
+    try:
+        with open_output(path, compression) as output:
+            for data in iter(chunks.get, None):
+                output.write(data)
+            finished = True
+    except Exception:
+        # Keep taking chunks so the producer never blocks on a full queue; the error surfaces from the future.
+        if not finished:
+            for _ in iter(chunks.get, None):
+                pass
+        raise
+    return path
+
+def remove_old_shards():
+    """Delete shards of an earlier run, which may have had more shards than this one."""
+    for path in glob.glob('article_data-[0-9]*.csv*'):
+        os.remove(path)
+
+def write_sharded_csv(rows, fieldnames, compression, shard_rows, shard_size_mb, writer_threads):
+    """Split rows into article_data-0001.csv[.gz|.zst], ... and compress the shards in parallel.
+
+    Rows are formatted on the calling thread and streamed in chunks of about SHARD_CHUNK_CHARS
+    to one pool thread per shard, which compresses them as they arrive. At most writer_threads
+    shards are open at once, each holding no more than SHARD_QUEUE_CHUNKS chunks in memory.
+    """
+    extension = COMPRESSION_EXTENSIONS[compression]
+    shard_chars = shard_size_mb * 1024 * 1024 if shard_size_mb else None
+    paths = []
+    in_flight = set()
+    remove_old_shards()
+
+    with ThreadPoolExecutor(max_workers=writer_threads) as executor:
+        def new_shard():
+            nonlocal in_flight
+            if len(in_flight) >= writer_threads:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            path = f'article_data-{len(paths) + 1:04d}.csv{extension}'
+            paths.append(path)
+            chunks = queue.Queue(maxsize=SHARD_QUEUE_CHUNKS)
+            in_flight.add(executor.submit(write_shard, path, chunks, compression))
+            return chunks
+
+        def flush(buffer, chunks):
+            chunks.put(buffer.getvalue().encode('utf-8'))
+            buffer.seek(0)
+            buffer.truncate()
+
+        buffer = io.StringIO(newline='')
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+        chunks = None
+        try:
+            for row in rows:
+                if chunks is None:
+                    chunks = new_shard()
+                    writer.writeheader()
+                    row_count = shard_size = 0
+                writer.writerow(row)
+                row_count += 1
+                if buffer.tell() >= SHARD_CHUNK_CHARS:
+                    shard_size += buffer.tell()
+                    flush(buffer, chunks)
+                if (shard_rows and row_count >= shard_rows) or (shard_chars and shard_size + buffer.tell() >= shard_chars):
+                    flush(buffer, chunks)
+                    chunks.put(None)
+                    chunks = None
+            if chunks is None and not paths:
+                chunks = new_shard()
+                writer.writeheader()
+            if chunks is not None:
+                flush(buffer, chunks)
+        finally:
+            # Always close the open shard, so its writer thread finishes even if formatting failed.
+            if chunks is not None:
+                chunks.put(None)
+
+        # Surface any write error from the pool.
+        for future in in_flight:
+            future.result()
+
+    return paths
+
+def save_to_csv(article_list, columns=None, compression=None, shard_rows=None, shard_size_mb=None, writer_threads=4):
     if not article_list:
         print('No articles were fetched or processed. Exiting.')
         sys.exit(0)
 
-    # Remove duplicates based on 'id' and 'title'
-    unique_articles = {}
-    for article in article_list:
-        article_id = article['id']
-        article_title = clean_text(article.get('title', ''))
-        
-        # Use both id and title as a composite key for deduplication
-        key = (article_id, article_title)
-        
-        if key not in unique_articles:
-            unique_articles[key] = article
+    if compression not in COMPRESSION_EXTENSIONS:
+        sys.exit(f'Unknown compression "{compression}". Use None, "gzip" or "zstd".')
+    if compression == 'zstd' and zstandard is None:
+        sys.exit('zstd compression requires the zstandard package: pip install zstandard')
 
-    flattened_articles = [flatten_json(article) for article in unique_articles.values()]
+    # fetch_articles has already dropped duplicates page by page
+    flattened_articles = [flatten_json(article) for article in article_list]
     fieldnames = columns if columns else sorted(list(set().union(*(article.keys() for article in flattened_articles))))
 
-    with open('article_data.csv', 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for article in flattened_articles:
-            row = {k: article.get(k, '') for k in fieldnames}
-            
-            # Clean the title
-            if 'title' in row:
-                row['title'] = clean_text(row['title'])
-            
-            # Convert epoch time to readable date
-            if 'published' in row:
-                row['published'] = epoch_to_date(int(row['published']))
+    rows = transform_rows(flattened_articles, fieldnames)
 
-            # Convert epoch time to readable date
-            if 'crawled' in row:
-                row['crawled'] = epoch_to_date(int(row['crawled']))
-            
-            writer.writerow(row)
+    if shard_rows or shard_size_mb:
+        paths = write_sharded_csv(rows, fieldnames, compression, shard_rows, shard_size_mb, writer_threads)
+        print(f'Article data has been successfully saved to {len(paths)} files: "{paths[0]}" to "{paths[-1]}"')
+    else:
+        path = f'article_data.csv{COMPRESSION_EXTENSIONS[compression]}'
+        with io.TextIOWrapper(open_output(path, compression), encoding='utf-8', newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f'Article data has been successfully saved to "{path}"')
+
+    print(f'Total articles: {len(article_list)}')
+
+    catalog = load_catalog()
+    update_catalog(catalog, article_list, flattened_articles)
+    save_catalog(catalog)
+
+def load_catalog(path=CATALOG_FILE):
+    """Load the column catalog: how often each column was seen and the longest list per path."""
+    if not os.path.exists(path):
+        return {'articles': 0, 'columns': {}, 'list_lengths': {}}
+    with open(path, encoding='utf-8') as catalog_file:
+        return json.load(catalog_file)
 
-    print(f'Article data has been successfully saved to "article_data.csv"')
-    print(f'Total articles after deduplication: {len(unique_articles)}')
+def save_catalog(catalog, path=CATALOG_FILE):
+    # Write to a temporary file first so an interrupted run never leaves a truncated catalog.
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as catalog_file:
+        json.dump(catalog, catalog_file, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+def record_list_lengths(d, list_lengths, prefix='', separator='_'):
+    if isinstance(d, dict):
+        for key, value in d.items():
+            if isinstance(value, (dict, list)):
+                record_list_lengths(value, list_lengths, f"{prefix}{separator}{key}" if prefix else key, separator)
+    elif isinstance(d, list):
+        list_lengths[prefix] = max(list_lengths.get(prefix, 0), len(d))
+        for index, value in enumerate(d):
+            if isinstance(value, (dict, list)):
+                record_list_lengths(value, list_lengths, f"{prefix}{separator}{index}" if prefix else str(index), separator)
+
+def update_catalog(catalog, articles, flattened_articles):
+    columns = catalog['columns']
+    for article in flattened_articles:
+        for column in article:
+            columns[column] = columns.get(column, 0) + 1
+    for article in articles:
+        record_list_lengths(article, catalog['list_lengths'])
+    catalog['articles'] += len(flattened_articles)
 
 def get_all_columns(token, stream_id):
-    sample_articles = fetch_articles(token, stream_id, article_count=10, fetch_all=False)
-    flattened_articles = [flatten_json(article) for article in sample_articles]
-    all_columns = sorted(list(set().union(*(article.keys() for article in flattened_articles))))
+    catalog = load_catalog()
+    if not catalog['columns']:
+        # No export has run yet: seed the catalog from a small sample.
+        sample_articles = fetch_articles(token, stream_id, article_count=10, fetch_all=False)
+        update_catalog(catalog, sample_articles, [flatten_json(article) for article in sample_articles])
+        save_catalog(catalog)
+    all_columns = sorted(catalog['columns'])
     
     # Group columns
     column_groups = defaultdict(list)
@@ -119,10 +321,13 @@ def get_all_columns(token, stream_id):
         else:
             column_groups['general'].append(column)
     
-    return column_groups
+    return column_groups, catalog
 
-def print_columns(column_groups):
-    print("Available columns:")
+def print_columns(column_groups, catalog=None):
+    if catalog:
+        print(f"Available columns (seen across {catalog['articles']} articles):")
+    else:
+        print("Available columns:")
     for group, columns in column_groups.items():
         print(f"\n{group.capitalize()} fields:")
         
@@ -132,11 +337,11 @@ def print_columns(column_groups):
         if group == 'general':
             # Print all general fields
             for column in sorted_columns:
-                print(f"  - {column}")
+                print(f"  - {column}{column_frequency(column, catalog)}")
         else:
             # Print only the first 10 columns for non-general fields
             for column in sorted_columns[:10]:
-                print(f"  - {column}")
+                print(f"  - {column}{column_frequency(column, catalog)}")
             
             # If there are more than 10 columns, indicate this
             if len(sorted_columns) > 10:
@@ -145,6 +350,13 @@ def print_columns(column_groups):
         # Print a summary of the structure
         structure = summarize_structure(sorted_columns)
         print(f"  Structure: {structure}")
+        if catalog and group in catalog['list_lengths']:
+            print(f"  Longest list seen: {catalog['list_lengths'][group]} items")
+
+def column_frequency(column, catalog):
+    if not catalog or not catalog['articles']:
+        return ''
+    return f" ({100 * catalog['columns'].get(column, 0) / catalog['articles']:.0f}%)"
 
 
 def summarize_structure(columns):
@@ -155,10 +367,11 @@ def summarize_structure(columns):
     common_prefix = columns[0].split('_')[0]
     
     # Check if all columns have numbered suffixes
-    numbered = all(re.match(rf"{common_prefix}_\d+", col) for col in columns)
+    matches = [NUMBERED_COLUMN.match(col) for col in columns]
+    numbered = all(match and match.group(1) == common_prefix for match in matches)
     
     if numbered:
-        max_number = max(int(col.split('_')[1]) for col in columns)
+        max_number = max(int(match.group(2)) for match in matches)
         return f"{common_prefix}_0 to {common_prefix}_{max_number}"
     else:
         # List unique suffixes
@@ -173,16 +386,20 @@ def main():
     fetch_all = True
     hours_ago = 24
     columns = ['id', 'title', 'origin_title', 'alternate_0_href', 'published', 'crawled', 'author', 'sources_0_title', 'sources_1_title', 'leoSummary_sentences_0_text', 'leoSummary_sentences_1_text']
+    compression = None  # None, 'gzip' or 'zstd' (zstd requires: pip install zstandard)
+    shard_rows = None  # Start a new file every N rows, e.g. 100000
+    shard_size_mb = None  # Start a new file every N MB of uncompressed CSV, e.g. 500
+    writer_threads = 4  # Threads compressing and writing shards in parallel
 
     if len(sys.argv) > 1 and sys.argv[1] == '--columns':
-        column_groups = get_all_columns(token, stream_id)
-        print_columns(column_groups)
+        column_groups, catalog = get_all_columns(token, stream_id)
+        print_columns(column_groups, catalog)
         sys.exit(0)
 
     last_timestamp = int(time.time() * 1000) - (hours_ago * 3600 * 1000)
 
     all_articles = fetch_articles(token, stream_id, article_count, fetch_all=fetch_all, last_timestamp=last_timestamp)
-    save_to_csv(all_articles, columns)
+    save_to_csv(all_articles, columns, compression=compression, shard_rows=shard_rows, shard_size_mb=shard_size_mb, writer_threads=writer_threads)
 
 if __name__ == '__main__':
     main()
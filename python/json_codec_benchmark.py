@@ -0,0 +1,69 @@
+import argparse
+import glob
+import os
+import time
+import feedly_json
+
+
+def sample_page(item_count=1000):
+    """Build a synthetic stream page shaped like /v3/streams/contents with full content."""
+    paragraph = 'Researchers observed a new ransomware campaign targeting healthcare providers. ' * 40
+    items = []
+    for index in range(item_count):
+        items.append({
+            'id': f'entry-{index}',
+            'title': f'Sample article {index} — threat report',
+            'published': 1700000000000 + index,
+            'crawled': 1700000000500 + index,
+            'origin': {'streamId': 'feed/https://example.com/rss', 'title': 'Example', 'htmlUrl': 'https://example.com'},
+            'alternate': [{'href': f'https://example.com/{index}', 'type': 'text/html'}],
+            'summary': {'content': paragraph, 'direction': 'ltr'},
+            'fullContent': f'<p>{paragraph}</p>' * 3,
+            'entities': [{'id': f'nlp/f/entity/gz:{n}', 'label': f'Entity {n}', 'salienceLevel': 'mention'} for n in range(10)],
+            'unread': True,
+        })
+    return {'id': 'user/sample/category/global.all', 'continuation': 'abc', 'items': items}
+
+
+def time_call(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the JSON backends available to feedly_json on recorded Feedly responses.')
+    parser.add_argument('responses', nargs='*', help='Recorded response files or directories of *.json files. A synthetic 1000-item page is used if omitted.')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Number of runs per measurement; the best run is reported. Default is 5.')
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.responses:
+        paths.extend(sorted(glob.glob(os.path.join(path, '*.json'))) if os.path.isdir(path) else [path])
+
+    payloads = []
+    for path in paths:
+        with open(path, 'rb') as file:
+            payloads.append(file.read())
+    if not payloads:
+        payloads.append(feedly_json.BACKENDS['json'][1](sample_page()))
+
+    total_mb = sum(len(payload) for payload in payloads) / 1e6
+    print(f'{len(payloads)} response(s), {total_mb:.1f} MB, best of {args.repeat} runs')
+    print(f'{"backend":<10}{"decode s":>10}{"MB/s":>9}{"encode s":>10}{"pretty s":>10}')
+
+    for name, (loads, dumps) in feedly_json.BACKENDS.items():
+        decoded = [loads(payload) for payload in payloads]
+        decode_time = time_call(lambda: [loads(payload) for payload in payloads], args.repeat)
+        encode_time = time_call(lambda: [dumps(document) for document in decoded], args.repeat)
+        pretty_time = time_call(lambda: [dumps(document, pretty=True) for document in decoded], args.repeat)
+        print(f'{name:<10}{decode_time:>10.4f}{total_mb / decode_time:>9.1f}{encode_time:>10.4f}{pretty_time:>10.4f}')
+
+    print(f'Active backend: {feedly_json.BACKEND}')
+
+
+if __name__ == '__main__':
+    main()
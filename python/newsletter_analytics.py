@@ -1,93 +1,308 @@
 import argparse
+import json
+import sqlite3
+import zlib
 from collections import defaultdict
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
 import requests
 from datetime import datetime, timedelta
 import pandas as pd
 
 API_KEY = "YOUR_API_KEY"
 BASE_URL = "https://api.feedly.com/v3"
+MAX_WORKERS = 8  # Number of requests in flight at the same time
+REQUEST_TIMEOUT = 60  # Seconds
+CACHE_FILE = "newsletter_cache.db"  # Results of issues already analyzed; sent issues never change
+CACHE_HTML = False  # Also keep a zlib-compressed copy of each issue's HTML in the cache
 
 headers = {
     "accept": "application/json",
     "Authorization": f"Bearer {API_KEY}"
 }
 
+# One pooled session so connections to the API are reused across all requests
+session = requests.Session()
+session.headers.update(headers)
+session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS))
+
 def get_newsletters():
     print("Fetching newsletters...")
     url = f"{BASE_URL}/newsletters"
-    response = requests.get(url, headers=headers)
+    response = session.get(url, timeout=REQUEST_TIMEOUT)
     newsletters = response.json()
     print(f"Found {len(newsletters)} newsletters")
     return newsletters
 
-def get_newsletter_issues(newsletter_id):
+def get_newsletter_issues(newsletter_id, newer_than=None, etag=None):
+    """Return (issues, etag), or (None, etag) if the listing has not changed since etag."""
     print(f"Fetching issues for newsletter ID: {newsletter_id}")
     url = f"{BASE_URL}/newsletters/{newsletter_id}/issues"
-    response = requests.get(url, headers=headers)
+    # newerThan lets the server drop old issues where the endpoint supports it;
+    # older issues are still filtered out client side when it does not.
+    params = {'newerThan': newer_than} if newer_than is not None else None
+    request_headers = {'If-None-Match': etag} if etag else None
+    response = session.get(url, params=params, headers=request_headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 304:
+        print(f"Issues for newsletter ID {newsletter_id} unchanged since the last run")
+        return None, etag
+    response.raise_for_status()
     issues = response.json()
     print(f"Found {len(issues)} issues")
-    return issues
+    return issues, response.headers.get('ETag')
 
 def get_issue_preview(newsletter_id, issue_id):
     print(f"Fetching preview for issue ID: {issue_id}")
     url = f"{BASE_URL}/newsletters/{newsletter_id}/issues/{issue_id}/view"
-    response = requests.get(url, headers=headers)
+    response = session.get(url, timeout=REQUEST_TIMEOUT)
     return response.json()
 
-def count_articles(html_content):
-    count = html_content.count("Summary.")
-    print(f"Found {count} articles in this issue")
-    return count
+class IssueStatsParser(HTMLParser):
+    """Collects per-issue metrics from preview HTML in a single pass.
+
+    HTML can be fed in chunks. Articles are counted structurally: each heading
+    (h1-h4) that contains a link is one article block. The "Summary." label the
+    current template puts in every block is only a fallback for issues without
+    linked headings, and a mismatch between the two counts is reported.
+    """
+    HEADINGS = {'h1', 'h2', 'h3', 'h4'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.summary_labels = 0
+        self.linked_headings = 0
+        self.link_count = 0
+        self.html_bytes = 0
+        self.heading_depth = 0
+        self.heading_has_link = False
+        self.text = []
+
+    def feed(self, data):
+        self.html_bytes += len(data.encode('utf-8'))
+        super().feed(data)
+
+    def close(self):
+        super().close()
+        self.count_text()
+
+    def count_text(self):
+        # A text node can arrive in pieces when it spans two fed chunks, so it is
+        # only searched once the next tag shows that it is complete.
+        if self.text:
+            self.summary_labels += ''.join(self.text).count("Summary.")
+            self.text = []
+
+    def handle_starttag(self, tag, attrs):
+        self.count_text()
+        if tag in self.HEADINGS:
+            if self.heading_depth == 0:
+                self.heading_has_link = False
+            self.heading_depth += 1
+        elif tag == 'a' and dict(attrs).get('href'):
+            self.link_count += 1
+            if self.heading_depth:
+                self.heading_has_link = True
+
+    def handle_endtag(self, tag):
+        self.count_text()
+        if tag in self.HEADINGS and self.heading_depth:
+            self.heading_depth -= 1
+            if self.heading_depth == 0 and self.heading_has_link:
+                self.linked_headings += 1
+
+    def handle_data(self, data):
+        self.text.append(data)
+
+    def metrics(self):
+        if self.linked_headings and self.summary_labels and self.linked_headings != self.summary_labels:
+            print(f"  Warning: {self.linked_headings} linked headings but {self.summary_labels} \"Summary.\" labels; "
+                  f"the newsletter template may have changed. Using the heading count.")
+        return {
+            'article_count': self.linked_headings or self.summary_labels,
+            'link_count': self.link_count,
+            'html_bytes': self.html_bytes,
+        }
+
+def analyze_issue_html(html_content, chunk_size=64 * 1024):
+    parser = IssueStatsParser()
+    for start in range(0, len(html_content), chunk_size):
+        parser.feed(html_content[start:start + chunk_size])
+    parser.close()
+    metrics = parser.metrics()
+    print(f"Found {metrics['article_count']} articles and {metrics['link_count']} links in this issue")
+    return metrics
+
+class IssueCache:
+    """SQLite cache of analyzed issues keyed by (newsletter_id, issue_id).
+
+    Sent issues are immutable, so entries never expire and a repeat run only
+    downloads the previews of issues it has not seen before.
+    """
+    def __init__(self, path=CACHE_FILE, store_html=CACHE_HTML):
+        self.store_html = store_html
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS issue_preview (
+                newsletter_id TEXT NOT NULL,
+                issue_id TEXT NOT NULL,
+                sent_at INTEGER,
+                article_count INTEGER NOT NULL,
+                link_count INTEGER,
+                html_bytes INTEGER,
+                html BLOB,
+                PRIMARY KEY (newsletter_id, issue_id)
+            )
+        ''')
+        # Caches created before link and size metrics existed get the new columns;
+        # their rows have no metrics yet and are analyzed again on the next run.
+        existing_columns = {row[1] for row in self.connection.execute('PRAGMA table_info(issue_preview)')}
+        for column in ('link_count', 'html_bytes'):
+            if column not in existing_columns:
+                self.connection.execute(f'ALTER TABLE issue_preview ADD COLUMN {column} INTEGER')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS issue_listing (
+                newsletter_id TEXT PRIMARY KEY,
+                etag TEXT,
+                issues JSON NOT NULL
+            )
+        ''')
+        self.connection.commit()
 
-def main(days_to_look_back):
+    def get_listing(self, newsletter_id):
+        """Return (etag, issues) of the last listing fetched for a newsletter, or (None, None)."""
+        row = self.connection.execute(
+            'SELECT etag, issues FROM issue_listing WHERE newsletter_id = ?', (newsletter_id,)
+        ).fetchone()
+        return (row[0], json.loads(row[1])) if row else (None, None)
+
+    def put_listing(self, newsletter_id, etag, issues):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO issue_listing (newsletter_id, etag, issues) VALUES (?, ?, ?)',
+            (newsletter_id, etag, json.dumps(issues))
+        )
+
+    def get(self, newsletter_id, issue_id):
+        row = self.connection.execute(
+            'SELECT article_count, link_count, html_bytes FROM issue_preview '
+            'WHERE newsletter_id = ? AND issue_id = ? AND link_count IS NOT NULL',
+            (newsletter_id, issue_id)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'article_count': row[0], 'link_count': row[1], 'html_bytes': row[2]}
+
+    def put(self, newsletter_id, issue, metrics, html_content=None):
+        html_blob = zlib.compress(html_content.encode('utf-8')) if self.store_html and html_content else None
+        self.connection.execute(
+            'INSERT OR REPLACE INTO issue_preview (newsletter_id, issue_id, sent_at, article_count, link_count, html_bytes, html) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (newsletter_id, issue['id'], issue.get('sentAt'), metrics['article_count'], metrics['link_count'], metrics['html_bytes'], html_blob)
+        )
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+def fetch_issues(task):
+    """Return (issues, etag, changed) for one newsletter, reusing the cached listing on 304."""
+    newsletter, newer_than, cached_etag, cached_issues = task
+    try:
+        # The ETag only applies if the cached listing is there to fall back on
+        issues, etag = get_newsletter_issues(newsletter['id'], newer_than, cached_etag if cached_issues is not None else None)
+        if issues is None:
+            return cached_issues, etag, False
+        return issues, etag, True
+    except Exception as e:
+        print(f"Error processing newsletter {newsletter['id']}: {str(e)}")
+        return [], None, False
+
+def issues_in_window(issues, look_back_date):
+    """Return (issue, sent_at) pairs sent after look_back_date, newest first.
+
+    Issues are sorted by sentAt, so the scan stops at the first issue outside the window.
+    """
+    in_window = []
+    for issue in sorted(issues, key=lambda issue: issue['sentAt'], reverse=True):
+        sent_at = datetime.fromtimestamp(issue['sentAt'] / 1000)
+        if sent_at <= look_back_date:
+            break
+        in_window.append((issue, sent_at))
+    return in_window
+
+def fetch_issue_metrics(task):
+    newsletter_id, issue = task
+    try:
+        issue_preview = get_issue_preview(newsletter_id, issue['id'])
+        html_content = issue_preview.get('html', '')
+        if not html_content:
+            print(f"  Warning: No HTML content found in the preview of issue {issue['id']}.")
+            return None
+        metrics = analyze_issue_html(html_content)
+        # The HTML is only handed back (and kept) when the cache stores it
+        return metrics, html_content if CACHE_HTML else None
+    except Exception as e:
+        print(f"  Error processing issue {issue['id']}: {str(e)}")
+        return None
+
+def main(days_to_look_back, refresh=False):
     print("Starting newsletter analysis...")
     look_back_date = datetime.now() - timedelta(days=days_to_look_back)
     print(f"Analyzing newsletters from {look_back_date} onwards")
-    data = defaultdict(lambda: {'Article Count': 0, 'Issue Count': 0, 'Latest Timestamp': datetime.min})
+    data = defaultdict(lambda: {'Article Count': 0, 'Issue Count': 0, 'Link Count': 0, 'HTML Bytes': 0, 'Latest Timestamp': datetime.min})
 
     newsletters = get_newsletters()
-    
-    for i, newsletter in enumerate(newsletters, 1):
-        print(f"\nProcessing newsletter {i}/{len(newsletters)}")
-        newsletter_id = newsletter['id']
-        newsletter_title = newsletter['title']
-        print(f"Newsletter: {newsletter_title} (ID: {newsletter_id})")
-        
-        try:
-            issues = get_newsletter_issues(newsletter_id)
-            
-            for issue in issues:
-                sent_at = datetime.fromtimestamp(issue['sentAt'] / 1000)
-                print(f"  Issue sent at: {sent_at}")
-                
-                if sent_at > look_back_date:
-                    print(f"  This issue is within the last {days_to_look_back} days. Analyzing...")
-                    try:
-                        issue_preview = get_issue_preview(newsletter_id, issue['id'])
-                        html_content = issue_preview.get('html', '')
-                        if not html_content:
-                            print("  Warning: No HTML content found in the issue preview.")
-                            continue
-                        article_count = count_articles(html_content)
-                        
-                        data[newsletter_id]['Newsletter Title'] = newsletter_title
-                        data[newsletter_id]['Article Count'] += article_count
-                        data[newsletter_id]['Issue Count'] += 1
-                        data[newsletter_id]['Latest Timestamp'] = max(data[newsletter_id]['Latest Timestamp'], sent_at)
-                        
-                        print(f"  Updated data for {newsletter_title}. Total articles: {data[newsletter_id]['Article Count']}")
-                    except Exception as e:
-                        print(f"  Error processing issue {issue['id']}: {str(e)}")
-                else:
-                    print(f"  This issue is older than {days_to_look_back} days. Skipping.")
-        except Exception as e:
-            print(f"Error processing newsletter {newsletter_id}: {str(e)}")
+    cache = IssueCache()
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # Issue listings for every newsletter, fetched concurrently; map keeps newsletter order
+        newer_than = int(look_back_date.timestamp() * 1000)
+        listing_tasks = [(newsletter, newer_than, *cache.get_listing(newsletter['id'])) for newsletter in newsletters]
+        listings = list(executor.map(fetch_issues, listing_tasks))
+
+        tasks = []
+        for newsletter, (issues, etag, changed) in zip(newsletters, listings):
+            # A malformed listing (e.g. an issue without sentAt) skips that newsletter only
+            try:
+                in_window = issues_in_window(issues, look_back_date)
+            except Exception as e:
+                print(f"Error processing newsletter {newsletter['id']}: {str(e)}")
+                continue
+            # Cached only once it parsed, so a bad listing is not reused on a 304 next run
+            if changed:
+                cache.put_listing(newsletter['id'], etag, issues)
+            print(f"Newsletter: {newsletter['title']} (ID: {newsletter['id']}): "
+                  f"{len(in_window)} issues within the last {days_to_look_back} days")
+            tasks.extend((newsletter, issue, sent_at) for issue, sent_at in in_window)
+
+        # Only issues missing from the cache are downloaded, concurrently
+        issue_metrics = [None if refresh else cache.get(newsletter['id'], issue['id']) for newsletter, issue, _ in tasks]
+        uncached = [index for index, metrics in enumerate(issue_metrics) if metrics is None]
+        print(f"\n{len(tasks) - len(uncached)} issues loaded from the cache, fetching {len(uncached)} previews")
+        previews = executor.map(fetch_issue_metrics, [(tasks[index][0]['id'], tasks[index][1]) for index in uncached])
+        for index, preview in zip(uncached, previews):
+            if preview is not None:
+                newsletter, issue, _ = tasks[index]
+                issue_metrics[index], html_content = preview
+                cache.put(newsletter['id'], issue, issue_metrics[index], html_content)
+        cache.close()
+
+        # Aggregate in newsletter and issue order so the output does not depend on completion order
+        for (newsletter, issue, sent_at), metrics in zip(tasks, issue_metrics):
+            if metrics is None:
+                continue
+            newsletter_id = newsletter['id']
+            data[newsletter_id]['Newsletter Title'] = newsletter['title']
+            data[newsletter_id]['Article Count'] += metrics['article_count']
+            data[newsletter_id]['Issue Count'] += 1
+            data[newsletter_id]['Link Count'] += metrics['link_count']
+            data[newsletter_id]['HTML Bytes'] += metrics['html_bytes']
+            data[newsletter_id]['Latest Timestamp'] = max(data[newsletter_id]['Latest Timestamp'], sent_at)
 
     print("\nCreating DataFrame and saving to CSV...")
     df = pd.DataFrame.from_dict(data, orient='index')
     df.index.name = 'Newsletter ID'
     df.reset_index(inplace=True)
-    df = df[['Newsletter ID', 'Newsletter Title', 'Article Count', 'Issue Count', 'Latest Timestamp']]
+    df = df[['Newsletter ID', 'Newsletter Title', 'Article Count', 'Issue Count', 'Link Count', 'HTML Bytes', 'Latest Timestamp']]
     print(df)
     df.to_csv('newsletter_analysis.csv', index=False)
     print("Analysis complete. Results saved to 'newsletter_analysis.csv'")
@@ -95,6 +310,7 @@ def main(days_to_look_back):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Analyze newsletters for a specified number of days.")
     parser.add_argument("-d", "--days", type=int, default=7, help="Number of days to look back (default: 7)")
+    parser.add_argument("--refresh", action="store_true", help=f"Download every issue again and overwrite {CACHE_FILE}")
     args = parser.parse_args()
 
-    main(args.days)
\ No newline at end of file
+    main(args.days, refresh=args.refresh)
\ No newline at end of file